@@ -0,0 +1,280 @@
+"""Общий кэш для всех процессов сервера на одной машине.
+
+LocMemCache живёт внутри процесса: у каждого воркера gunicorn свой
+холодный кэш, свои копии фрагментов, а сброс поколения доходит только
+до одного из них. Этот backend хранит записи в файле SQLite в режиме
+WAL, поэтому его видят все процессы, а отдельный сервис не нужен.
+
+Целые числа, которые помещаются в 8 байт, хранятся как INTEGER, и incr
+выполняется одним UPDATE под блокировкой записи — счётчики поколений
+(core.cache) не теряют увеличений при одновременных запросах.
+Остальные значения хранятся в pickle.
+
+Размер кэша ограничен числом записей (MAX_ENTRIES) и суммой размеров
+значений в байтах (MAX_SIZE). При переполнении сначала удаляются
+просроченные записи, затем давно не читанные: время последнего чтения
+обновляется не чаще раза в ACCESS_RESOLUTION секунд, чтобы чтения
+почти не превращались в записи.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_stats VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_stats SET entries = entries + 1, size = size + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_stats SET entries = entries - 1, size = size - OLD.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache
+BEGIN
+    UPDATE cache_stats SET size = size - OLD.size + NEW.size;
+END;
+"""
+
+UPSERT = """
+INSERT INTO cache (key, value, expires, accessed, size)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value,
+    expires = excluded.expires,
+    accessed = excluded.accessed,
+    size = excluded.size
+"""
+
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+INTEGER_MIN, INTEGER_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._access_resolution = float(
+            options.get('ACCESS_RESOLUTION', 1)
+        )
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # Соединение своё у каждого потока и у каждого процесса: после
+        # fork соединение родителя использовать нельзя.
+        if getattr(self._local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self._path, timeout=self._busy_timeout, isolation_level=None
+            )
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = NORMAL')
+            db.executescript(SCHEMA)
+            self._local.db, self._local.pid = db, os.getpid()
+        return self._local.db
+
+    def _write(self):
+        """Транзакция, которая сразу берёт блокировку записи."""
+        return _Transaction(self._db)
+
+    @staticmethod
+    def _encode(value):
+        # INTEGER в SQLite восьмибайтный, большие числа идут в pickle.
+        if type(value) is int and INTEGER_MIN <= value <= INTEGER_MAX:
+            return value, 8
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return sqlite3.Binary(data), len(data)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _row(self, key, value, timeout, now):
+        value, size = self._encode(value)
+        return (
+            key, value, self.get_backend_timeout(timeout), now,
+            size + len(key),
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            # Просроченная запись считается отсутствующей.
+            cursor = db.execute(
+                UPSERT + ' WHERE cache.expires IS NOT NULL '
+                'AND cache.expires <= ?',
+                self._row(key, value, timeout, now) + (now,),
+            )
+            self._cull(db, now)
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self._get_many(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        db = self._db
+        rows = db.execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({", ".join("?" * len(keys))}) AND {ALIVE}',
+            keys + [now],
+        ).fetchall()
+        stale = [
+            key for key, _, accessed in rows
+            if now - accessed > self._access_resolution
+        ]
+        if stale:
+            db.execute(
+                f'UPDATE cache SET accessed = ? '
+                f'WHERE key IN ({", ".join("?" * len(stale))})',
+                [now] + stale,
+            )
+        return {key: self._decode(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        rows = [
+            self._row(self._key(key, version), value, timeout, now)
+            for key, value in data.items()
+        ]
+        with self._write() as db:
+            db.executemany(UPSERT, rows)
+            self._cull(db, now)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self._db.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            (self.get_backend_timeout(timeout), key, now),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            cursor = db.execute(
+                f'UPDATE cache SET value = value + ? WHERE key = ? '
+                f"AND typeof(value) = 'integer' AND {ALIVE}",
+                (delta, key, now),
+            )
+            if cursor.rowcount != 1:
+                raise ValueError(f"Key '{key}' not found")
+            (value,), = db.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)
+            )
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._db.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._db.execute(
+                f'DELETE FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(keys))})',
+                keys,
+            )
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def stats(self):
+        """Число записей и их суммарный размер в байтах."""
+        entries, size = self._stats(self._db)
+        return {'entries': entries, 'size': size}
+
+    @staticmethod
+    def _stats(db):
+        return db.execute('SELECT entries, size FROM cache_stats').fetchone()
+
+    def _over_limit(self, db):
+        entries, size = self._stats(db)
+        if entries <= self._max_entries and size <= self._max_size:
+            return 0
+        return entries
+
+    def _cull(self, db, now):
+        if not self._over_limit(db):
+            return
+        db.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (now,),
+        )
+        if self._cull_frequency == 0:
+            if self._over_limit(db):
+                db.execute('DELETE FROM cache')
+            return
+        entries = self._over_limit(db)
+        while entries:
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (max(entries // self._cull_frequency, 1),),
+            )
+            entries = self._over_limit(db)
+
+
+class _Transaction:
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.db.execute('COMMIT' if exc_type is None else 'ROLLBACK')
@@ -0,0 +1,47 @@
+"""Фоновые задачи после коммита.
+
+Задачи выполняются в пулах потоков процесса, у каждого вида задач
+(миниатюры, ленты) свой пул с числом потоков из настроек. При нуле
+потоков задача выполняется сразу после коммита в потоке запроса, как
+в тестах.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executors = {}
+
+
+def after_commit(name, workers, func, *args):
+    """Выполняет func(*args) после коммита в пуле потоков name."""
+    if workers:
+        transaction.on_commit(lambda: submit(name, workers, func, *args))
+    else:
+        transaction.on_commit(lambda: func(*args))
+
+
+def submit(name, workers, func, *args):
+    return executor(name, workers).submit(_run, func, *args)
+
+
+def executor(name, workers):
+    if name not in _executors:
+        _executors[name] = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=name,
+        )
+    return _executors[name]
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception(
+            'Фоновая задача %s%r не выполнена', func.__name__, args
+        )
+    finally:
+        # Соединения фонового потока сами не закрываются.
+        connections.close_all()
@@ -0,0 +1,167 @@
+"""Поколения кэша.
+
+Вместо удаления устаревших записей в ключ кэша добавляется номер
+поколения; при изменении данных поколение увеличивается, и старые
+записи просто перестают читаться, пока их не вытеснит кэш.
+
+Новое поколение начинается со времени в миллисекундах, чтобы после
+вытеснения ключа или перезапуска кэша номера не повторялись.
+
+Поколение 'page' версионирует постраничный кэш анонимных посетителей
+(anonymous_cache_page).
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import condition
+
+
+def generation_key(name):
+    return f'generation:{name}'
+
+
+def get_generation(name):
+    key = generation_key(name)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, int(time.time() * 1000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(*names):
+    for name in names:
+        try:
+            cache.incr(generation_key(name))
+        except ValueError:
+            get_generation(name)
+
+
+def page_cache_stats():
+    """Счётчики попаданий и промахов постраничного кэша."""
+    return {
+        name: cache.get(f'page_cache:{name}', 0)
+        for name in ('hits', 'misses')
+    }
+
+
+def count_page_cache(name):
+    key = f'page_cache:{name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def anonymous_cache_page(view):
+    """Кэширует страницу целиком для анонимных посетителей.
+
+    Включается настройкой PAGE_CACHE_ENABLED. Ключ строится из полного
+    адреса с query string и поколения 'page', которое сбрасывают
+    сигналы постов, комментариев, групп и подписок. Запросы с
+    сессионной кукой идут мимо кэша. Ответ помечается заголовком
+    X-Page-Cache: HIT или MISS.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            not settings.PAGE_CACHE_ENABLED
+            or request.method not in ('GET', 'HEAD')
+            or settings.SESSION_COOKIE_NAME in request.COOKIES
+        ):
+            return view(request, *args, **kwargs)
+        url = hashlib.md5(
+            request.build_absolute_uri().encode()
+        ).hexdigest()
+        key = f'page:{get_generation("page")}:{url}'
+        response = cache.get(key)
+        if response is not None:
+            count_page_cache('hits')
+            response['X-Page-Cache'] = 'HIT'
+            return response
+        count_page_cache('misses')
+        response = view(request, *args, **kwargs)
+        patch_vary_headers(response, ('Cookie',))
+        if (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        ):
+            cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+        response['X-Page-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+
+def generation_etag(name):
+    """etag_func для condition(): меняется вместе с поколением кэша.
+
+    В ETag входят пользователь и CSRF-кука, потому что от них зависит
+    разметка страницы.
+    """
+    def etag(request, *args, **kwargs):
+        validator = ':'.join(str(part) for part in (
+            get_generation(name),
+            request.user.pk,
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        ))
+        return hashlib.md5(validator.encode()).hexdigest()
+    return etag
+
+
+def generation_cache_page(name, timeout):
+    """Кэширует одинаковый для всех ответ до смены поколения name.
+
+    Подходит для страниц без пользовательской разметки, например
+    RSS. Ответ кэшируется отдельно для каждых схемы, хоста и пути и
+    хранится вместе со временем рендеринга, так что повторные запросы
+    с If-None-Match или If-Modified-Since получают 304 без рендеринга
+    и без запросов к базе.
+    """
+    def decorator(view):
+        def cache_key(request):
+            # В ответе абсолютные ссылки: они зависят от схемы и хоста.
+            # Query string в ключ не входит, чтобы лишние параметры не
+            # плодили записи в кэше.
+            address = f'{request.scheme}://{request.get_host()}{request.path}'
+            path = hashlib.md5(address.encode()).hexdigest()
+            return f'generation_page:{name}:{get_generation(name)}:{path}'
+
+        def lookup(request):
+            # condition() спрашивает ETag и Last-Modified до вызова
+            # представления: поколение и запись кэша читаются один раз
+            # за запрос.
+            found = request.__dict__.setdefault('_generation_pages', {})
+            if name not in found:
+                key = cache_key(request)
+                found[name] = key, cache.get(key)
+            return found[name]
+
+        def etag(request, *args, **kwargs):
+            key, _ = lookup(request)
+            return hashlib.md5(key.encode()).hexdigest()
+
+        def last_modified(request, *args, **kwargs):
+            _, cached = lookup(request)
+            return cached[1] if cached is not None else None
+
+        @condition(etag_func=etag, last_modified_func=last_modified)
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key, cached = lookup(request)
+            if cached is not None:
+                return cached[0]
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                rendered = timezone.now().replace(microsecond=0)
+                response['Last-Modified'] = http_date(rendered.timestamp())
+                cache.set(key, (response, rendered), timeout)
+            return response
+        return wrapper
+    return decorator
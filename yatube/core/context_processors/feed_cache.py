@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from core.cache import get_generation
+
+
+def feed_cache(request):
+    """Поколение и время жизни кэша фрагментов лент."""
+    return {
+        'feed_generation': SimpleLazyObject(lambda: get_generation('feed')),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
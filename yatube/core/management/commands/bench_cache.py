@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.backends.sqlite import SQLiteCache
+
+
+def hammer(cache, key, times):
+    for _ in range(times):
+        cache.incr(key)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость LocMemCache и общего кэша SQLite и '
+        'проверяет, что incr не теряет увеличений между процессами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ops', type=int, default=5000,
+            help='Сколько операций каждого вида выполнить.',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Сколько процессов одновременно увеличивают счётчик.',
+        )
+        parser.add_argument(
+            '--size', type=int, default=2048,
+            help='Размер значения в байтах (примерно фрагмент ленты).',
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            backends = {
+                'locmem': LocMemCache('bench', {
+                    'OPTIONS': {'MAX_ENTRIES': options['ops'] * 2},
+                }),
+                'sqlite': SQLiteCache(
+                    os.path.join(directory, 'cache.sqlite3'),
+                    {'OPTIONS': {'MAX_ENTRIES': options['ops'] * 2}},
+                ),
+            }
+            self.stdout.write(
+                f'{"операция":>10} '
+                + ' '.join(f'{name + ", оп/с":>14}' for name in backends)
+            )
+            results = {
+                name: self.measure(cache, options)
+                for name, cache in backends.items()
+            }
+            for operation in results['locmem']:
+                self.stdout.write(f'{operation:>10} ' + ' '.join(
+                    f'{results[name][operation]:>14.0f}' for name in backends
+                ))
+            self.stdout.write(
+                f'{options["workers"]} процессов по {options["ops"]} incr:'
+            )
+            for name, cache in backends.items():
+                self.stdout.write(
+                    f'{name:>10}: счётчик в основном процессе '
+                    f'{self.shared_incr(cache, options)} из '
+                    f'{options["workers"] * options["ops"]}'
+                )
+
+    def measure(self, cache, options):
+        """Число операций в секунду для каждого вида операций."""
+        value = 'x' * options['size']
+        keys = [f'key:{number}' for number in range(options['ops'])]
+        operations = {
+            'set': lambda: [cache.set(key, value) for key in keys],
+            'get': lambda: [cache.get(key) for key in keys],
+            'get_many': lambda: [
+                cache.get_many(keys[start:start + 10])
+                for start in range(0, len(keys), 10)
+            ],
+            'incr': lambda: [cache.incr('counter') for key in keys],
+        }
+        cache.set('counter', 0, None)
+        results = {}
+        for name, operation in operations.items():
+            started = time.perf_counter()
+            operation()
+            results[name] = len(keys) / (time.perf_counter() - started)
+        return results
+
+    def shared_incr(self, cache, options):
+        cache.set('shared', 0, None)
+        # fork: процессы получают копию объекта кэша, как воркеры
+        # gunicorn после загрузки приложения.
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(
+                target=hammer, args=(cache, 'shared', options['ops'])
+            )
+            for _ in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return cache.get('shared')
@@ -0,0 +1,119 @@
+"""Учёт SQL-запросов и бюджеты на число запросов для view.
+
+QueryBudgetMiddleware записывает, сколько запросов и времени БД
+потратил каждый запрос, и сверяет число запросов с бюджетом из
+settings.QUERY_BUDGETS по имени view (например, 'posts:index').
+При превышении пишет предупреждение в лог, а при
+QUERY_BUDGET_STRICT = True бросает QueryBudgetExceeded — так
+превышение роняет тесты.
+"""
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.test.utils import override_settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper, считающая запросы и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+@contextmanager
+def record_queries():
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+def check_budget(view_name, recorder, strict=None):
+    budget = settings.QUERY_BUDGETS.get(view_name)
+    if budget is None or recorder.count <= budget:
+        return
+    message = (
+        f'{view_name}: {recorder.count} SQL-запросов '
+        f'({recorder.duration * 1000:.1f} мс) при бюджете {budget}'
+    )
+    if strict is None:
+        strict = settings.QUERY_BUDGET_STRICT
+    if strict:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+        logger.debug(
+            '%s: %d SQL-запросов, %.1f мс',
+            match.view_name, recorder.count, recorder.duration * 1000,
+        )
+        if settings.DEBUG:
+            response['Server-Timing'] = (
+                f'db;dur={recorder.duration * 1000:.1f};'
+                f'desc="{recorder.count} queries"'
+            )
+        check_budget(match.view_name, recorder)
+        return response
+
+
+class QueryBudgetTestMixin:
+    """Миксин для TestCase: проверка бюджета запросов view.
+
+    Включает строгий режим на весь класс: любой запрос тестового
+    клиента сверх бюджета роняет тест, а не только пишет в лог.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._strict_budget = override_settings(QUERY_BUDGET_STRICT=True)
+        cls._strict_budget.enable()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls._strict_budget.disable()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            super().tearDownClass()
+        finally:
+            cls._strict_budget.disable()
+
+    @contextmanager
+    def assertQueryBudget(self, view_name):
+        with record_queries() as recorder:
+            yield recorder
+        try:
+            check_budget(view_name, recorder, strict=True)
+        except QueryBudgetExceeded as error:
+            raise self.failureException(str(error)) from None
@@ -0,0 +1,12 @@
+from django import template
+from django.conf import settings
+
+register = template.Library()
+
+
+@register.filter
+def page_window(page_obj, size=settings.PAGINATOR_WINDOW):
+    """Номера страниц вокруг текущей вместо всего page_range."""
+    first = max(page_obj.number - size, 1)
+    last = min(page_obj.number + size, page_obj.paginator.num_pages)
+    return range(first, last + 1)
@@ -0,0 +1,17 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from yatube.settings_test import OVERRIDES
+
+
+class TestRunner(DiscoverRunner):
+    """Запускает тесты с настройками из yatube.settings_test."""
+
+    def setup_test_environment(self, **kwargs):
+        self.test_settings = override_settings(**OVERRIDES)
+        self.test_settings.enable()
+        super().setup_test_environment(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        self.test_settings.disable()
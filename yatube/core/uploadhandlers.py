@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загружаемые файлы на диск, но не больше UPLOAD_MAX_SIZE.
+
+    Файл любого размера идёт во временный файл кусками, поэтому память
+    воркера не растёт. Всё, что сверх предела, читается из запроса и
+    выбрасывается: у файла остаётся настоящий размер в size, и форма
+    отвечает понятной ошибкой, а не обрывом соединения.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_SIZE:
+            return None
+        return super().receive_data_chunk(raw_data, start)
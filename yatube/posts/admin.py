@@ -1,9 +1,24 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from . import search
+from .models import Comment, Follow, Group, Post, Profile
+from .utils import CachedCountPaginator
 
 
-class PostAdmin(admin.ModelAdmin):
+class ScalableAdmin(admin.ModelAdmin):
+    """Список, который не замедляется с ростом таблицы.
+
+    Число строк берётся из кэша, второй COUNT по всей таблице ради
+    «показать все» не делается, связанные объекты выбираются JOIN, а
+    внешние ключи редактируются полем с id вместо <select> со всеми
+    строками связанной таблицы.
+    """
+
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+
+class PostAdmin(ScalableAdmin):
     list_display = (
         'pk',
         'text',
@@ -16,6 +31,28 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author',)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'group':
+            # Групп немного, но без этого их список читался бы заново
+            # для каждой строки списка постов.
+            if not hasattr(request, 'group_choices'):
+                request.group_choices = list(iter(field.choices))
+            field.choices = request.group_choices
+        return field
+
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по полнотекстовому индексу, а не LIKE по всей таблице.
+
+        Отбор — подзапросом к индексу, поэтому находятся все подходящие
+        посты, а не первые SEARCH_MAX_RESULTS, как на сайте.
+        """
+        if not search_term:
+            return queryset, False
+        return search.matching(queryset, search_term), False
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -24,12 +61,14 @@ class GroupAdmin(admin.ModelAdmin):
         'title',
         'slug',
         'description',
+        'posts_count',
     )
+    readonly_fields = ('posts_count',)
     list_filter = ('slug',)
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ScalableAdmin):
     list_display = (
         'pk',
         'post',
@@ -39,17 +78,41 @@ class CommentAdmin(admin.ModelAdmin):
     )
     list_filter = ('created',)
     empty_value_display = '-пусто-'
+    list_select_related = ('post', 'author')
+    raw_id_fields = ('post', 'author')
+    # created индексирован только после post (comment_post_page_idx),
+    # а весь список по нему не отсортировать без сортировки в памяти;
+    # id растёт в том же порядке.
+    ordering = ('-pk',)
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(ScalableAdmin):
     list_display = (
         'pk',
         'user',
         'author',
     )
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+
+
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'user',
+        'posts_count',
+        'followers_count',
+        'celebrity',
+    )
+    # Счётчики и флаг «звезды» ведут сигналы и posts.timelines, save()
+    # их не пишет.
+    readonly_fields = ('posts_count', 'followers_count', 'celebrity')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
 
 
 admin.site.register(Follow, FollowAdmin)
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
+admin.site.register(Profile, ProfileAdmin)
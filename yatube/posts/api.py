@@ -0,0 +1,219 @@
+"""JSON API только для чтения: ленты и пост с комментариями.
+
+Страницы листаются по курсору (дата, id), как HTML-ленты: каждый
+запрос — один проход по индексу без COUNT и OFFSET. Параметр fields
+(для комментариев — comment_fields) выбирает поля, а строки читаются
+через values() только с нужными колонками, без экземпляров моделей.
+Число SQL-запросов каждого view не зависит от размера страницы.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from . import timelines
+from .models import Comment, Group, Post, User
+from .utils import (
+    CommentPaginator, FeedPaginator, TimelinePaginator, decode_cursor,
+    encode_cursor, seek_filter,
+)
+
+# Поле API и его путь для values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'updated': 'updated',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(view):
+    """Превращает словарь из view в JSON, а ошибки — в JSON с кодом."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            data = view(request, *args, **kwargs)
+        except ApiError as error:
+            data, status = {'error': str(error)}, error.status
+        except Http404:
+            data, status = {'error': 'Не найдено.'}, 404
+        else:
+            status = 200
+        return JsonResponse(
+            data, status=status, json_dumps_params={'ensure_ascii': False}
+        )
+    return wrapper
+
+
+def selected_fields(request, available, param='fields'):
+    if not request.GET.get(param):
+        return list(available)
+    names = request.GET[param].split(',')
+    unknown = sorted(set(names) - available.keys())
+    if unknown:
+        raise ApiError(f'Неизвестные поля {param}: {", ".join(unknown)}.')
+    return names
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get('limit', settings.NUMBER_POSTS))
+    except ValueError:
+        raise ApiError('limit должен быть числом.')
+    return max(1, min(limit, settings.API_MAX_LIMIT))
+
+
+def read_cursor(request):
+    token = request.GET.get('cursor')
+    if not token:
+        return None
+    cursor = decode_cursor(token)
+    if cursor is None:
+        raise ApiError('Неверный курсор.')
+    return cursor
+
+
+def project(row, fields, available):
+    """Строка values() с ключами-именами полей API."""
+    item = {name: row[available[name]] for name in fields}
+    if item.get('image'):
+        item['image'] = default_storage.url(item['image'])
+    return item
+
+
+def next_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def cursor_page(request, queryset, ordering, available, param='fields'):
+    """Строки страницы после курсора из запроса и курсор следующей.
+
+    Читает limit + 1 строку, чтобы узнать, есть ли следующая страница.
+    """
+    fields = selected_fields(request, available, param)
+    limit = page_size(request)
+    cursor = read_cursor(request)
+    if cursor is not None:
+        queryset = queryset.filter(seek_filter(ordering, cursor))
+    date_field, id_field = (field.lstrip('-') for field in ordering)
+    lookups = {date_field, id_field, *(available[name] for name in fields)}
+    rows = list(queryset.order_by(*ordering).values(*lookups)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][date_field], rows[-1][id_field])
+    return [project(row, fields, available) for row in rows], next_cursor
+
+
+def feed(request, queryset):
+    posts, cursor = cursor_page(
+        request, queryset, FeedPaginator.ordering, POST_FIELDS
+    )
+    return {'results': posts, 'next': next_url(request, cursor)}
+
+
+@api_view
+def index(request):
+    return feed(request, Post.objects.all())
+
+
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return feed(request, Post.objects.filter(group_id=group.pk))
+
+
+@api_view
+def profile(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return feed(request, Post.objects.filter(author_id=author.pk))
+
+
+@api_view
+def follow_index(request):
+    """Лента подписок: записи материализованной ленты и посты «звёзд».
+
+    Из обоих источников берётся по limit + 1 паре (дата, id) после
+    курсора, после слияния сами посты читаются одним запросом.
+    """
+    if not request.user.is_authenticated:
+        raise ApiError('Нужна авторизация.', status=401)
+    fields = selected_fields(request, POST_FIELDS)
+    limit = page_size(request)
+    cursor = read_cursor(request)
+    entries, celebrity_posts = timelines.follow_feed(request.user)
+    sources = [(entries, TimelinePaginator.entry_ordering)]
+    if celebrity_posts is not None:
+        sources.append((celebrity_posts, FeedPaginator.ordering))
+    keys = []
+    for queryset, ordering in sources:
+        if cursor is not None:
+            queryset = queryset.filter(seek_filter(ordering, cursor))
+        keys.extend(queryset.order_by(*ordering).values_list(
+            *(field.lstrip('-') for field in ordering)
+        )[:limit + 1])
+    keys = sorted(keys, reverse=True)[:limit + 1]
+    next_cursor = None
+    if len(keys) > limit:
+        keys = keys[:limit]
+        next_cursor = encode_cursor(*keys[-1])
+    lookups = {'id', *(POST_FIELDS[name] for name in fields)}
+    rows = {
+        row['id']: row for row in Post.objects.filter(
+            pk__in=[pk for _, pk in keys]
+        ).values(*lookups)
+    }
+    return {
+        'results': [
+            project(rows[pk], fields, POST_FIELDS)
+            for _, pk in keys if pk in rows
+        ],
+        'next': next_url(request, next_cursor),
+    }
+
+
+@api_view
+def post_detail(request, post_id):
+    """Пост и страница его комментариев от старых к новым."""
+    fields = selected_fields(request, POST_FIELDS)
+    row = Post.objects.filter(pk=post_id).values(
+        *(POST_FIELDS[name] for name in fields)
+    ).first()
+    if row is None:
+        raise Http404
+    comments, cursor = cursor_page(
+        request,
+        Comment.objects.filter(post_id=post_id),
+        CommentPaginator.ordering,
+        COMMENT_FIELDS,
+        param='comment_fields',
+    )
+    return {
+        'post': project(row, fields, POST_FIELDS),
+        'comments': comments,
+        'next': next_url(request, cursor),
+    }
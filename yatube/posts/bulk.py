@@ -0,0 +1,85 @@
+"""Массовая загрузка постов, комментариев и подписок.
+
+bulk_create обходит save() и сигналы: даты не проставляются сами,
+счётчики, ленты подписок и поисковый индекс не обновляются. Команды
+import_community и generate_dataset пишут данные внутри
+dates_from_input(), а затем вызывают finalize().
+"""
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.core.management import call_command
+
+from core.cache import bump_generation
+from . import search, timelines
+from .models import Comment, Follow, Post
+from .utils import count_cache_key, count_generation
+
+
+@contextmanager
+def dates_from_input():
+    """Отключает auto_now и auto_now_add на время загрузки.
+
+    Иначе bulk_create заменил бы переданные даты текущим временем.
+    """
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Post._meta.get_field('updated'),
+        Comment._meta.get_field('created'),
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def batches(objects, size):
+    """Пачки для bulk_create, чтобы не держать в памяти все объекты."""
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def finalize(stdout, fill_timelines=True, reindex=True):
+    """Восстанавливает то, что при save() делают сигналы.
+
+    Ленты нужны после загрузки постов или подписок, индекс — после
+    загрузки постов или комментариев.
+    """
+    call_command('repair_counters', stdout=stdout)
+    if fill_timelines:
+        timelines.backfill_all()
+    if reindex:
+        search.rebuild()
+    reset_feed_caches()
+    stdout.write('Счётчики, ленты и поисковый индекс обновлены.')
+
+
+def reset_feed_caches():
+    """Сбрасывает кэш лент и счётчиков, как сигналы при save().
+
+    Остальной кэш (сессии, миниатюры) не трогается. Кэшированные
+    числа постов в лентах подписок удаляются у всех, кто на кого-то
+    подписан: загрузка могла изменить любую из них.
+    """
+    bump_generation(
+        'feed', 'page', 'syndication',
+        *(count_generation(model) for model in (Post, Comment, Follow)),
+    )
+    cache.delete(count_cache_key('index'))
+    followers = Follow.objects.order_by().values_list(
+        'user_id', flat=True
+    ).distinct()
+    for batch in batches(followers.iterator(), 1000):
+        cache.delete_many(
+            [count_cache_key(f'follow:{user_id}') for user_id in batch]
+        )
@@ -0,0 +1,159 @@
+"""Потоковая выгрузка постов и комментариев автора.
+
+Архив собирается по мере отдачи: строки читаются из базы порциями
+через iterator(), каждая сразу превращается в байты и уходит клиенту,
+поэтому память не зависит от числа постов автора. Выгрузка бывает в
+JSON, в CSV и в zip, где кроме archive.json лежат картинки постов.
+"""
+import csv
+import io
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Post
+
+FORMATS = {
+    'json': ('application/json', 'json'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'zip': ('application/zip', 'zip'),
+}
+
+CSV_FIELDS = ('type', 'id', 'post', 'date', 'group', 'text', 'image')
+
+# Сколько строк читать из базы за раз и сколько байт картинки за раз.
+ROWS_CHUNK = 2000
+FILE_CHUNK = 64 * 1024
+
+
+def post_rows(author):
+    return Post.objects.filter(author=author).order_by(
+        'pub_date', 'id'
+    ).values(
+        'id', 'pub_date', 'updated', 'group__slug', 'text', 'image',
+        'comments_count',
+    ).iterator(chunk_size=ROWS_CHUNK)
+
+
+def comment_rows(author):
+    return Comment.objects.filter(author=author).order_by('id').values(
+        'id', 'post_id', 'created', 'text'
+    ).iterator(chunk_size=ROWS_CHUNK)
+
+
+def export(author, export_format):
+    """Выгрузка кусками байт для StreamingHttpResponse или файла."""
+    chunks = {
+        'json': json_chunks,
+        'csv': csv_chunks,
+        'zip': zip_chunks,
+    }[export_format](author)
+    return buffered(chunks)
+
+
+def buffered(parts):
+    """Склеивает мелкие части в куски примерно по FILE_CHUNK байт."""
+    pending, size = [], 0
+    for part in parts:
+        pending.append(part)
+        size += len(part)
+        if size >= FILE_CHUNK:
+            yield b''.join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b''.join(pending)
+
+
+def json_chunks(author):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    yield f'{{"author": {encoder.encode(author.username)}'.encode()
+    for name, rows in (
+        ('posts', post_rows(author)), ('comments', comment_rows(author))
+    ):
+        yield f', "{name}": ['.encode()
+        separator = ''
+        for row in rows:
+            yield (separator + encoder.encode(row)).encode()
+            separator = ', '
+        yield b']'
+    yield b'}'
+
+
+def csv_chunks(author):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FIELDS)
+    for row in post_rows(author):
+        writer.writerow((
+            'post', row['id'], '', row['pub_date'].isoformat(),
+            row['group__slug'] or '', row['text'], row['image'],
+        ))
+        yield take(buffer)
+    for row in comment_rows(author):
+        writer.writerow((
+            'comment', row['id'], row['post_id'],
+            row['created'].isoformat(), '', row['text'], '',
+        ))
+        yield take(buffer)
+    yield take(buffer)
+
+
+def take(buffer):
+    data = buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+class ZipStream(io.RawIOBase):
+    """Файл без seek, в который пишет zipfile, а генератор забирает.
+
+    На потоке без seek zipfile пишет размеры после данных файла, так
+    что архив можно отдавать кусками, не собирая его целиком.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def zip_chunks(author):
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with archive.open('archive.json', 'w', force_zip64=True) as output:
+            for chunk in json_chunks(author):
+                output.write(chunk)
+                yield stream.take()
+        images = Post.objects.filter(author=author).exclude(
+            image=''
+        ).order_by('id').values_list('image', flat=True)
+        for name in images.iterator(chunk_size=ROWS_CHUNK):
+            if not default_storage.exists(name):
+                continue
+            # Картинки уже сжаты, второй раз их не сжимаем.
+            info = zipfile.ZipInfo(name)
+            info.compress_type = zipfile.ZIP_STORED
+            with default_storage.open(name) as source, archive.open(
+                info, 'w', force_zip64=True
+            ) as output:
+                for chunk in iter(lambda: source.read(FILE_CHUNK), b''):
+                    output.write(chunk)
+                    yield stream.take()
+    yield stream.take()
@@ -0,0 +1,118 @@
+"""RSS и Atom для общей ленты, групп и авторов.
+
+Посты выбираются теми же запросами, что и HTML-ленты (for_cards).
+Готовый ответ кэшируется до смены поколения 'syndication', которое
+сигналы сбрасывают при изменении постов и групп; читатели лент,
+присылающие ETag или дату, получают 304.
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse, reverse_lazy
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from core.cache import generation_cache_page
+from .models import Group, Post, User
+
+
+class PostsFeed(Feed):
+    def items(self, obj):
+        return self.posts(obj)[:settings.SYNDICATION_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item.text).chars(50)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=(item.pk,))
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_author_link(self, item):
+        return reverse('posts:profile', args=(item.author.username,))
+
+    def item_categories(self, item):
+        return (item.group.title,) if item.group else ()
+
+
+class IndexFeed(PostsFeed):
+    title = 'Yatube: последние посты'
+    link = reverse_lazy('posts:index')
+    description = subtitle = 'Новые посты всех авторов'
+
+    def posts(self, obj):
+        return Post.objects.for_cards()
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def link(self, group):
+        return reverse('posts:group_posts', args=(group.slug,))
+
+    def description(self, group):
+        return group.description
+
+    subtitle = description
+
+    def posts(self, group):
+        return group.posts.for_cards()
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=(author.username,))
+
+    def description(self, author):
+        return f'Посты пользователя {author.username}'
+
+    subtitle = description
+
+    def posts(self, author):
+        return author.posts.for_cards()
+
+
+class IndexAtomFeed(IndexFeed):
+    feed_type = Atom1Feed
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+
+
+class AuthorAtomFeed(AuthorFeed):
+    feed_type = Atom1Feed
+
+
+def cached(feed):
+    return generation_cache_page(
+        'syndication', settings.SYNDICATION_CACHE_TIMEOUT
+    )(feed)
+
+
+index_rss = cached(IndexFeed())
+index_atom = cached(IndexAtomFeed())
+group_rss = cached(GroupFeed())
+group_atom = cached(GroupAtomFeed())
+author_rss = cached(AuthorFeed())
+author_atom = cached(AuthorAtomFeed())
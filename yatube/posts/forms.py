@@ -1,13 +1,83 @@
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import (
+    TemporaryUploadedFile, UploadedFile,
+)
 from django.forms import ModelForm
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
 
 from .models import Comment, Post
 
+EXIF_ORIENTATION = 0x0112
+
 
 class PostForm(ModelForm):
+    """Форма поста.
+
+    Картинка проверяется без раскодирования целиком: Pillow читает
+    заголовок, этого хватает, чтобы узнать размеры и отказать
+    картинкам-бомбам до того, как они окажутся в памяти. Раскодируется
+    картинка, только если её нужно повернуть по EXIF.
+    """
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        upload = self.files.get('image')
+        # Файл сверх предела обрезан обработчиком загрузки, разбирать
+        # его как картинку бессмысленно.
+        self.image_too_large = (
+            upload is not None and upload.size > settings.UPLOAD_MAX_SIZE
+        )
+        if self.image_too_large:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        if self.image_too_large:
+            raise forms.ValidationError(
+                'Файл больше %(limit)s.',
+                code='too_large',
+                params={'limit': filesizeformat(settings.UPLOAD_MAX_SIZE)},
+            )
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            return image
+        width, height = image.image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise forms.ValidationError(
+                'Картинка больше %(limit)s мегапикселей.',
+                code='too_many_pixels',
+                params={'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6},
+            )
+        return self.normalize_orientation(image)
+
+    @staticmethod
+    def normalize_orientation(upload):
+        """Поворачивает картинку по EXIF и сохраняет в новый файл."""
+        upload.seek(0)
+        with Image.open(upload) as image:
+            if image.getexif().get(EXIF_ORIENTATION, 1) == 1:
+                upload.seek(0)
+                return upload
+            image_format = image.format
+            rotated = ImageOps.exif_transpose(image)
+        result = TemporaryUploadedFile(
+            upload.name, upload.content_type, 0, None
+        )
+        rotated.save(
+            result, image_format, quality=95,
+            exif=rotated.info.get('exif', b''),
+        )
+        result.size = result.tell()
+        result.seek(0)
+        result.image = rotated
+        return result
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,131 @@
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from posts import timelines
+from posts.models import Follow, Post, Profile, TimelineEntry, User
+from posts.utils import TimelinePaginator
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает раскладку постов по лентам при записи и подмешивание '
+        'при чтении на сгенерированных данных и ищет точку перехода. '
+        'Все данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--followers', nargs='+', type=int,
+            default=[10, 100, 1000, 5000, 20000],
+            help='Числа подписчиков автора, которые нужно проверить.',
+        )
+        parser.add_argument(
+            '--posts', type=int, default=20,
+            help='Сколько постов публикует автор.',
+        )
+        parser.add_argument(
+            '--reads', type=int, default=200,
+            help='Сколько раз активные подписчики открывают ленту.',
+        )
+        parser.add_argument(
+            '--noise', type=int, default=50,
+            help='Сколько обычных авторов читает каждый подписчик.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"подписчиков":>12} {"запись, мс":>12} {"чтение, мс":>12} '
+            f'{"запись, мс":>12} {"чтение, мс":>12} {"итого":>8}'
+        )
+        self.stdout.write(
+            f'{"":>12} {"-- при записи --":>25} {"-- при чтении --":>25}'
+        )
+        crossover = None
+        for followers in sorted(options['followers']):
+            push = self.measure(followers, True, options)
+            pull = self.measure(followers, False, options)
+            winner = 'запись' if sum(push) <= sum(pull) else 'чтение'
+            if winner == 'чтение' and crossover is None:
+                crossover = followers
+            self.stdout.write(
+                f'{followers:>12} {push[0]:>12.1f} {push[1]:>12.1f} '
+                f'{pull[0]:>12.1f} {pull[1]:>12.1f} {winner:>8}'
+            )
+        if crossover is None:
+            self.stdout.write(
+                'Раскладка при записи выгоднее на всех размерах.'
+            )
+        else:
+            self.stdout.write(
+                f'Подмешивание при чтении выгоднее, начиная примерно с '
+                f'{crossover} подписчиков '
+                f'(сейчас FANOUT_FOLLOWERS_LIMIT = '
+                f'{settings.FANOUT_FOLLOWERS_LIMIT}).'
+            )
+
+    def measure(self, followers, push, options):
+        """Время публикации и чтения лент для одного режима, в мс."""
+        # Режим задаётся порогом: чуть выше числа подписчиков автор
+        # обычный, ровно на нём — «звезда».
+        limit = followers + 1 if push else followers
+        with transaction.atomic(), override_settings(
+            FANOUT_FOLLOWERS_LIMIT=limit
+        ):
+            author, readers = self.generate(followers, options['noise'])
+            started = time.perf_counter()
+            for number in range(options['posts']):
+                Post.objects.create(text=f'Пост {number}', author=author)
+            write = time.perf_counter() - started
+            started = time.perf_counter()
+            for reader in random.choices(readers, k=options['reads']):
+                entries, celebrity_posts = timelines.follow_feed(reader)
+                paginator = TimelinePaginator(
+                    entries, settings.NUMBER_POSTS, posts=celebrity_posts
+                )
+                list(paginator.cursor_page())
+            read = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return write * 1000, read * 1000
+
+    def generate(self, followers, noise):
+        prefix = uuid.uuid4().hex[:8]
+        author = User.objects.create(username=f'{prefix}_author')
+        User.objects.bulk_create(
+            User(username=f'{prefix}_reader_{number}')
+            for number in range(followers)
+        )
+        readers = list(User.objects.filter(
+            username__startswith=f'{prefix}_reader_'
+        ))
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=author) for reader in readers
+        )
+        Profile.objects.create(
+            user=author,
+            followers_count=followers,
+            celebrity=followers >= settings.FANOUT_FOLLOWERS_LIMIT,
+        )
+        # Чтобы ленты не были пустыми, каждый подписчик читает ещё
+        # обычных авторов.
+        others = []
+        for number in range(noise):
+            other = User.objects.create(username=f'{prefix}_other_{number}')
+            others.append(Post.objects.create(
+                text=f'Пост {number}', author=other
+            ))
+        sample = readers[:settings.NUMBER_POSTS * 10]
+        Follow.objects.bulk_create(
+            Follow(user=reader, author_id=post.author_id)
+            for post in others for reader in sample
+        )
+        TimelineEntry.objects.bulk_create(
+            timelines.make_entry(reader.pk, post)
+            for post in others for reader in sample
+        )
+        return author, sample
@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает посты и комментарии автора в JSON или CSV, '
+        'либо в zip вместе с картинками постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='json',
+            dest='export_format',
+        )
+        parser.add_argument(
+            '--output', help='Файл для выгрузки, по умолчанию stdout.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {options["username"]}.')
+        chunks = export.export(author, options['export_format'])
+        if options['output'] is None:
+            self.write(chunks, sys.stdout.buffer)
+            return
+        with open(options['output'], 'wb') as output:
+            self.write(chunks, output)
+        self.stdout.write(f'Выгрузка сохранена в {options["output"]}.')
+
+    @staticmethod
+    def write(chunks, output):
+        for chunk in chunks:
+            output.write(chunk)
@@ -0,0 +1,252 @@
+import random
+import time
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from posts.bulk import batches, dates_from_input, finalize
+from posts.models import Comment, Follow, Group, Post, User
+
+# Из скольких готовых предложений собираются тексты: Faker медленный,
+# а на миллионе постов каждое предложение генерировать незачем.
+SENTENCES_POOL = 2000
+
+
+def zipf_weights(count, skew):
+    """Накопленные веса рангов 1..count, вес ранга — 1 / rank ** skew.
+
+    При skew = 0 все равновероятны, чем больше skew, тем сильнее
+    выделяются первые ранги.
+    """
+    return list(accumulate(
+        1 / rank ** skew for rank in range(1, count + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетический набор данных для нагрузочных тестов: '
+        'пользователей, группы, посты, подписки и комментарии. '
+        'Активность авторов, их популярность и обсуждаемость постов '
+        'распределены по степенному закону. Все пользователи получают '
+        'один пароль, чтобы load_test мог входить от их имени. '
+        'С одним --seed набор получается одинаковым.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок одного пользователя.',
+        )
+        parser.add_argument(
+            '--author-skew', type=float, default=1.0,
+            help=(
+                'Показатель степенного закона для активности и '
+                'популярности авторов.'
+            ),
+        )
+        parser.add_argument(
+            '--comment-skew', type=float, default=1.0,
+            help='Показатель степенного закона для обсуждаемости постов.',
+        )
+        parser.add_argument(
+            '--group-share', type=float, default=0.7,
+            help='Доля постов, опубликованных в группах.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней распределяются посты.',
+        )
+        parser.add_argument(
+            '--prefix', default='load',
+            help='Префикс имён пользователей и адресов групп.',
+        )
+        parser.add_argument('--password', default='load-password')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix} уже есть, выберите '
+                f'другой --prefix.'
+            )
+        if options['users'] < 2:
+            raise CommandError('Нужно хотя бы два пользователя.')
+        self.random = random.Random(options['seed'])
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(options['seed'])
+        self.sentences = self.faker.sentences(SENTENCES_POOL)
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        with dates_from_input():
+            users = self.step('user', self.create_users, options)
+            groups = self.step('group', self.create_groups, options)
+            # Порядок авторов случаен, чтобы «звёзды» не были просто
+            # первыми по id.
+            self.random.shuffle(users)
+            author_weights = zipf_weights(len(users), options['author_skew'])
+            self.step(
+                'post', self.create_posts, options, users, groups,
+                author_weights,
+            )
+            self.step(
+                'follow', self.create_follows, options, users, author_weights
+            )
+            self.step('comment', self.create_comments, options, users)
+        finalize(self.stdout)
+
+    def step(self, name, create, options, *args):
+        started = time.monotonic()
+        with transaction.atomic():
+            result = create(options, *args)
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'{name}: готово за {elapsed:.1f} с')
+        return result
+
+    def text(self, low, high):
+        return ' '.join(
+            self.random.choices(self.sentences, k=self.random.randint(
+                low, high
+            ))
+        )
+
+    def create_users(self, options):
+        password = make_password(options['password'])
+        prefix = options['prefix']
+        users = (
+            User(
+                username=f'{prefix}{number}',
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                password=password,
+            )
+            for number in range(options['users'])
+        )
+        for batch in batches(users, self.batch_size):
+            User.objects.bulk_create(batch)
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def create_groups(self, options):
+        prefix = options['prefix']
+        Group.objects.bulk_create(
+            Group(
+                slug=f'{prefix}-{number}',
+                title=self.faker.sentence(nb_words=2)[:200],
+                description=self.text(1, 3),
+            )
+            for number in range(options['groups'])
+        )
+        return list(Group.objects.filter(
+            slug__startswith=f'{prefix}-'
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def create_posts(self, options, users, groups, author_weights):
+        """Посты равномерно по времени, авторы — по степенному закону.
+
+        Даты растут вместе с id, как у постов, созданных через сайт.
+        """
+        count = options['posts']
+        start = self.now - timedelta(days=options['days'])
+        step = (self.now - start) / max(count, 1)
+        authors = self.random.choices(
+            users, cum_weights=author_weights, k=count
+        )
+
+        def posts():
+            for number, author_id in enumerate(authors):
+                pub_date = start + step * (number + self.random.random())
+                group_id = None
+                if groups and self.random.random() < options['group_share']:
+                    group_id = self.random.choice(groups)
+                yield Post(
+                    author_id=author_id,
+                    group_id=group_id,
+                    text=self.text(1, 6),
+                    pub_date=pub_date,
+                    updated=pub_date,
+                )
+
+        self.first_post = (
+            Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        ) + 1
+        for batch in batches(posts(), self.batch_size):
+            Post.objects.bulk_create(batch)
+
+    def create_follows(self, options, users, author_weights):
+        """У каждого число подписок случайно со средним --follows.
+
+        Популярность автора совпадает с его активностью: чаще пишущих
+        читают больше.
+        """
+        average = options['follows']
+        if not average:
+            return
+
+        def follows():
+            for user_id in users:
+                wanted = min(
+                    int(self.random.expovariate(1 / average)), len(users) - 1
+                )
+                authors = set(self.random.choices(
+                    users, cum_weights=author_weights, k=wanted
+                ))
+                authors.discard(user_id)
+                for author_id in authors:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        for batch in batches(follows(), self.batch_size):
+            Follow.objects.bulk_create(batch)
+
+    def create_comments(self, options, users):
+        """Комментарии к постам, обсуждаемость — по степенному закону.
+
+        Комментарий появляется в среднем через сутки после поста.
+        """
+        ids, dates = array('q'), array('d')
+        for pk, pub_date in Post.objects.filter(
+            pk__gte=self.first_post
+        ).order_by('pk').values_list('pk', 'pub_date').iterator():
+            ids.append(pk)
+            dates.append(pub_date.timestamp())
+        if not ids:
+            return
+        order = list(range(len(ids)))
+        self.random.shuffle(order)
+        chosen = self.random.choices(
+            order,
+            cum_weights=zipf_weights(len(order), options['comment_skew']),
+            k=options['comments'],
+        )
+        now = self.now.timestamp()
+
+        def comments():
+            for index in chosen:
+                created = min(
+                    dates[index] + self.random.expovariate(1 / 86400), now
+                )
+                yield Comment(
+                    post_id=ids[index],
+                    author_id=self.random.choice(users),
+                    text=self.text(1, 2),
+                    created=datetime.fromtimestamp(
+                        created, timezone.utc
+                    ),
+                )
+
+        for batch in batches(comments(), self.batch_size):
+            Comment.objects.bulk_create(batch)
@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import make_thumbnails
+
+
+def generate(name):
+    try:
+        make_thumbnails(name)
+    except Exception as error:
+        return name, error
+    finally:
+        connections.close_all()
+    return name, None
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт недостающие миниатюры для картинок постов, '
+        'распределяя работу по ядрам процессора.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Сколько процессов создают миниатюры.',
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='')
+            .order_by()
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        failed = 0
+        for name, error in self.generate_all(names, options['workers']):
+            if error is not None:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+        self.stdout.write(
+            f'Проверено картинок: {len(names)}, с ошибками: {failed}'
+        )
+
+    def generate_all(self, names, workers):
+        if workers <= 1:
+            for name in names:
+                try:
+                    make_thumbnails(name)
+                except Exception as error:
+                    yield name, error
+                else:
+                    yield name, None
+            return
+        # Процессы-потомки не должны делить соединение с родителем.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(generate, name) for name in names]
+            for future in as_completed(futures):
+                yield future.result()
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.conf import settings
+
+from posts.models import Post
+from posts.thumbnails import card_variants
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает, сколько байт экономят варианты картинок карточек '
+        'по сравнению с исходными файлами и одной миниатюрой 960 px.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sample', type=int, default=50,
+            help='Сколько последних картинок постов взять.',
+        )
+
+    def handle(self, *args, **options):
+        images = [
+            post.image for post in Post.objects.exclude(image='')
+            .only('image')[:options['sample']]
+        ]
+        if not images:
+            self.stdout.write('Нет постов с картинками.')
+            return
+        original = sum(image.size for image in images)
+        totals = {}
+        for image_format, width, geometry, variant_options in card_variants():
+            image_format = image_format or settings.THUMBNAIL_FORMAT
+            totals[image_format, width] = sum(
+                self.thumbnail_size(image, geometry, variant_options)
+                for image in images
+            )
+        baseline = totals.get((settings.THUMBNAIL_FORMAT, 960))
+        self.stdout.write(
+            f'Картинок: {len(images)}, исходные файлы: {original} байт'
+        )
+        self.stdout.write(
+            f'{"вариант":>12} {"байт":>12} {"экономия к исходным":>20} '
+            f'{"к одной миниатюре 960":>22}'
+        )
+        for (image_format, width), size in totals.items():
+            line = (
+                f'{image_format + " " + str(width):>12} {size:>12} '
+                f'{self.savings(size, original):>20}'
+            )
+            if baseline:
+                line += f' {self.savings(size, baseline):>22}'
+            self.stdout.write(line)
+
+    @staticmethod
+    def thumbnail_size(image, geometry, options):
+        thumbnail = get_thumbnail(image, geometry, **options)
+        return thumbnail.storage.size(thumbnail.name)
+
+    @staticmethod
+    def savings(size, reference):
+        return f'{(1 - size / reference) * 100:+.0f}%'
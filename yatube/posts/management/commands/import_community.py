@@ -0,0 +1,238 @@
+import csv
+import gzip
+import json
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.bulk import dates_from_input, finalize
+from posts.models import Comment, Follow, Group, Post, User
+
+MODELS = {
+    'group': Group,
+    'post': Post,
+    'comment': Comment,
+    'follow': Follow,
+}
+
+# Как часто печатать скорость импорта, в секундах.
+REPORT_INTERVAL = 5
+
+
+def read_records(path):
+    """Записи из файла JSONL или CSV (можно сжатого gzip) по одной."""
+    opener = gzip.open if path.endswith('.gz') else open
+    name = path[:-3] if path.endswith('.gz') else path
+    with opener(path, 'rt', encoding='utf-8', newline='') as source:
+        if name.endswith('.csv'):
+            yield from csv.DictReader(source)
+            return
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково импортирует группы, посты, комментарии или подписки из '
+        'JSONL или CSV пачками bulk_create. Импортируйте по порядку: '
+        'group, post, comment, follow. Поля записей: group — slug, '
+        'title, description; post — id, author, text, group, pub_date, '
+        'image; comment — id, post, author, text, created; follow — '
+        'user, author. Авторы указываются по username, недостающие '
+        'пользователи создаются без пароля. Записи с id и подписки '
+        'повторно не создаются, поэтому импорт можно перезапускать.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=MODELS)
+        parser.add_argument(
+            'path', help='Файл .jsonl или .csv, можно с расширением .gz.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей пишется одной транзакцией.',
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help=(
+                'Продолжить после сбоя с записи, сохранённой в файле '
+                '<path>.progress.'
+            ),
+        )
+        parser.add_argument(
+            '--skip-finalize', action='store_true',
+            help=(
+                'Не пересчитывать счётчики, ленты, поисковый индекс и '
+                'кэш: удобно, если следом импортируется ещё один файл.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        model, path = options['model'], options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден.')
+        progress_path = f'{path}.progress'
+        done = self.read_progress(progress_path) if options['resume'] else 0
+        self.load_maps(model)
+        self.skipped = 0
+        records = islice(read_records(path), done, None)
+        started = reported = time.monotonic()
+        processed = 0
+        with dates_from_input():
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+                with transaction.atomic():
+                    MODELS[model].objects.bulk_create(
+                        self.build(model, batch), ignore_conflicts=True
+                    )
+                done += len(batch)
+                processed += len(batch)
+                self.write_progress(progress_path, done)
+                if time.monotonic() - reported >= REPORT_INTERVAL:
+                    reported = time.monotonic()
+                    self.report(model, done, processed, started)
+        self.report(model, done, processed, started)
+        if not options['skip_finalize']:
+            finalize(
+                self.stdout,
+                fill_timelines=model in ('post', 'follow'),
+                reindex=model in ('post', 'comment'),
+            )
+
+    def load_maps(self, model):
+        self.now = timezone.now()
+        self.password = make_password(None)
+        self.users = {}
+        self.groups = {}
+        self.posts = set()
+        if model != 'group':
+            self.users = dict(User.objects.values_list('username', 'id'))
+        if model == 'post':
+            self.groups = dict(Group.objects.values_list('slug', 'id'))
+
+    def build(self, model, records):
+        self.resolve(model, records)
+        make = getattr(self, f'make_{model}')
+        objects = []
+        for record in records:
+            try:
+                objects.append(make(record))
+            except (KeyError, TypeError, ValueError) as error:
+                self.skipped += 1
+                self.stderr.write(f'Пропущена запись {record!r}: {error!r}')
+        return objects
+
+    def resolve(self, model, records):
+        """Находит или создаёт пользователей и посты пачки заранее."""
+        fields = {'follow': ('user', 'author')}.get(model, ('author',))
+        usernames = {
+            record.get(field) for record in records for field in fields
+        }
+        self.create_users(usernames - self.users.keys() - {None, ''})
+        if model == 'comment':
+            ids = {record.get('post') for record in records} - {None, ''}
+            self.posts = set(Post.objects.filter(
+                pk__in=[int(pk) for pk in ids if str(pk).isdigit()]
+            ).values_list('pk', flat=True))
+
+    def create_users(self, usernames):
+        if not usernames:
+            return
+        User.objects.bulk_create(
+            (
+                User(username=username, password=self.password)
+                for username in usernames
+            ),
+            ignore_conflicts=True,
+        )
+        self.users.update(User.objects.filter(
+            username__in=usernames
+        ).values_list('username', 'id'))
+
+    def make_group(self, record):
+        return Group(
+            slug=record['slug'],
+            title=record.get('title') or record['slug'],
+            description=record.get('description') or '',
+        )
+
+    def make_post(self, record):
+        if not record['text']:
+            raise ValueError('пустой текст')
+        group_id = None
+        if record.get('group'):
+            group_id = self.groups.get(record['group'])
+            if group_id is None:
+                raise ValueError(f'нет группы {record["group"]}')
+        pub_date = self.parse_date(record.get('pub_date'))
+        return Post(
+            id=record.get('id') or None,
+            author_id=self.users[record['author']],
+            group_id=group_id,
+            text=record['text'],
+            image=record.get('image') or '',
+            pub_date=pub_date,
+            updated=pub_date,
+        )
+
+    def make_comment(self, record):
+        if not record['text']:
+            raise ValueError('пустой текст')
+        post_id = int(record['post'])
+        if post_id not in self.posts:
+            raise ValueError(f'нет поста {post_id}')
+        return Comment(
+            id=record.get('id') or None,
+            post_id=post_id,
+            author_id=self.users[record['author']],
+            text=record['text'],
+            created=self.parse_date(record.get('created')),
+        )
+
+    def make_follow(self, record):
+        user_id = self.users[record['user']]
+        author_id = self.users[record['author']]
+        if user_id == author_id:
+            raise ValueError('подписка на себя')
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def parse_date(self, value):
+        if not value:
+            return self.now
+        date = parse_datetime(value)
+        if date is None:
+            raise ValueError(f'неверная дата {value}')
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+        return date
+
+    @staticmethod
+    def read_progress(path):
+        try:
+            with open(path) as progress:
+                return int(progress.read())
+        except (OSError, ValueError):
+            return 0
+
+    @staticmethod
+    def write_progress(path, done):
+        with open(f'{path}.tmp', 'w') as progress:
+            progress.write(str(done))
+        os.replace(f'{path}.tmp', path)
+
+    def report(self, model, done, processed, started):
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(
+            f'{model}: обработано записей {done}, пропущено '
+            f'{self.skipped}, {rate:.0f} записей/с'
+        )
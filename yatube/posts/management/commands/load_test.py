@@ -0,0 +1,247 @@
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+# Доли сценариев по умолчанию: чтение преобладает, как на живом сайте.
+DEFAULT_MIX = (
+    'index=30,group_posts=15,profile=15,post_detail=25,'
+    'follow_index=10,add_comment=5'
+)
+# Сколько адресов каждого вида выбирается из базы для запросов.
+SAMPLE_SIZE = 1000
+
+
+def percentile(values, share):
+    """Процентиль по ближайшему рангу для отсортированного списка."""
+    if not values:
+        return 0
+    rank = max(1, math.ceil(share * len(values)))
+    return values[rank - 1]
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in Command.scenarios:
+            raise CommandError(f'Неизвестный сценарий {name}.')
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f'Неверная доля сценария {name}.')
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный сайт параллельными запросами к главной, '
+        'группам, профилям, постам, ленте подписок и добавлению '
+        'комментариев и печатает пропускную способность и задержки '
+        'p50/p95/p99 по сценариям. Адреса берутся из базы, пользователи '
+        'входят с паролем из generate_dataset.'
+    )
+
+    scenarios = (
+        'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+        'add_comment',
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Число параллельных клиентов.',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=30,
+            help='Сколько секунд длится нагрузка.',
+        )
+        parser.add_argument(
+            '--requests', type=int,
+            help='Остановиться после этого числа запросов вместо времени.',
+        )
+        parser.add_argument(
+            '--mix', default=DEFAULT_MIX,
+            help='Доли сценариев: имя=вес через запятую.',
+        )
+        parser.add_argument(
+            '--prefix', default='load',
+            help='Префикс пользователей, от имени которых идут запросы.',
+        )
+        parser.add_argument('--password', default='load-password')
+        parser.add_argument('--timeout', type=float, default=10)
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        self.mix = parse_mix(options['mix'])
+        self.base_url = options['base_url'].rstrip('/')
+        self.options = options
+        self.load_targets(options['prefix'])
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.issued = 0
+        self.deadline = time.monotonic() + options['duration']
+        seed = options['seed']
+        started = time.monotonic()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            workers = [
+                pool.submit(
+                    self.worker,
+                    random.Random(None if seed is None else seed + number),
+                )
+                for number in range(options['concurrency'])
+            ]
+            for worker in workers:
+                worker.result()
+        self.report(time.monotonic() - started)
+
+    def load_targets(self, prefix):
+        """Случайные адреса из базы и пользователи для входа."""
+        self.slugs = list(Group.objects.order_by('?').values_list(
+            'slug', flat=True
+        )[:SAMPLE_SIZE])
+        self.usernames = list(User.objects.filter(
+            posts__isnull=False
+        ).distinct().order_by('?').values_list(
+            'username', flat=True
+        )[:SAMPLE_SIZE])
+        self.post_ids = list(Post.objects.order_by('?').values_list(
+            'pk', flat=True
+        )[:SAMPLE_SIZE])
+        self.readers = list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('?').values_list('username', flat=True)[:SAMPLE_SIZE])
+        if not self.post_ids:
+            raise CommandError(
+                'В базе нет постов: сначала запустите generate_dataset.'
+            )
+        if not self.slugs:
+            self.mix.pop('group_posts', None)
+        if not self.readers:
+            raise CommandError(
+                f'Нет пользователей с префиксом {prefix}: сначала '
+                f'запустите generate_dataset.'
+            )
+
+    def next_request(self):
+        """Разрешение на ещё один запрос, пока не вышли время или лимит."""
+        with self.lock:
+            limit = self.options['requests']
+            if limit is not None:
+                if self.issued >= limit:
+                    return False
+            elif time.monotonic() >= self.deadline:
+                return False
+            self.issued += 1
+            return True
+
+    def worker(self, rng):
+        session = requests.Session()
+        self.login(session, rng.choice(self.readers))
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        while self.next_request():
+            name = rng.choices(names, weights)[0]
+            method, path, data = getattr(self, f'request_{name}')(
+                rng, session
+            )
+            started = time.perf_counter()
+            try:
+                response = session.request(
+                    method,
+                    self.base_url + path,
+                    data=data,
+                    headers={'Referer': self.base_url + path},
+                    allow_redirects=False,
+                    timeout=self.options['timeout'],
+                )
+                failed = response.status_code >= 400
+            except requests.RequestException:
+                failed = True
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.latencies[name].append(elapsed)
+                if failed:
+                    self.errors[name] += 1
+
+    def login(self, session, username):
+        address = self.base_url + reverse('users:login')
+        session.get(address, timeout=self.options['timeout'])
+        response = session.post(
+            address,
+            data={
+                'username': username,
+                'password': self.options['password'],
+                'csrfmiddlewaretoken': session.cookies.get('csrftoken', ''),
+            },
+            headers={'Referer': address},
+            allow_redirects=False,
+            timeout=self.options['timeout'],
+        )
+        if response.status_code != 302:
+            raise CommandError(
+                f'Не удалось войти как {username}: проверьте --password.'
+            )
+
+    def request_index(self, rng, session):
+        return 'get', reverse('posts:index'), None
+
+    def request_group_posts(self, rng, session):
+        slug = rng.choice(self.slugs)
+        return 'get', reverse('posts:group_posts', args=(slug,)), None
+
+    def request_profile(self, rng, session):
+        username = rng.choice(self.usernames)
+        return 'get', reverse('posts:profile', args=(username,)), None
+
+    def request_post_detail(self, rng, session):
+        post_id = rng.choice(self.post_ids)
+        return 'get', reverse('posts:post_detail', args=(post_id,)), None
+
+    def request_follow_index(self, rng, session):
+        return 'get', reverse('posts:follow_index'), None
+
+    def request_add_comment(self, rng, session):
+        # Токен берётся из cookie сессии при каждом вызове: после входа
+        # Django выдаёт новый.
+        return 'post', reverse(
+            'posts:add_comment', args=(rng.choice(self.post_ids),)
+        ), {
+            'text': f'Нагрузочный комментарий {rng.randrange(10 ** 6)}',
+            'csrfmiddlewaretoken': session.cookies.get('csrftoken', ''),
+        }
+
+    def report(self, elapsed):
+        self.stdout.write(
+            f'{"сценарий":<14} {"запросов":>9} {"ошибок":>7} {"в с":>8} '
+            f'{"p50, мс":>9} {"p95, мс":>9} {"p99, мс":>9}'
+        )
+        total = []
+        for name in self.scenarios:
+            if name in self.latencies:
+                self.report_line(
+                    name, self.latencies[name], self.errors[name], elapsed
+                )
+                total.extend(self.latencies[name])
+        self.report_line('всего', total, sum(self.errors.values()), elapsed)
+
+    def report_line(self, name, latencies, errors, elapsed):
+        latencies = sorted(latencies)
+        p50, p95, p99 = (
+            percentile(latencies, share) * 1000 for share in (0.5, 0.95, 0.99)
+        )
+        rate = len(latencies) / elapsed if elapsed else 0
+        self.stdout.write(
+            f'{name:<14} {len(latencies):>9} {errors:>7} {rate:>8.1f} '
+            f'{p50:>9.1f} {p95:>9.1f} {p99:>9.1f}'
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает полнотекстовый индекс постов и комментариев, '
+        'например после массового импорта в обход моделей.'
+    )
+
+    def handle(self, *args, **options):
+        search.rebuild()
+        self.stdout.write('Поисковый индекс пересобран.')
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F
+
+from posts import timelines
+from posts.models import Follow, Group, Post, Profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики постов, комментариев '
+        'и подписчиков и переключает раскладку постов «звёзд», чьё '
+        'число подписчиков пересекло пороги.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = self.create_missing_profiles()
+            groups = self.repair(
+                Group.objects.annotate(total=Count('posts')), 'posts_count'
+            )
+            profiles = self.repair(
+                Profile.objects.annotate(total=Count('user__posts')),
+                'posts_count',
+            )
+            profiles += self.repair(
+                Profile.objects.annotate(total=Count('user__following')),
+                'followers_count',
+            )
+            posts = self.repair(
+                Post.objects.annotate(total=Count('comments')),
+                'comments_count',
+            )
+        promoted, demoted = self.repair_celebrities()
+        self.stdout.write(
+            f'Создано профилей: {created}, исправлено групп: {groups}, '
+            f'профилей: {profiles}, постов: {posts}. Новых «звёзд»: '
+            f'{promoted}, возвращено в ленты: {demoted}.'
+        )
+
+    def create_missing_profiles(self):
+        authors = set(Post.objects.filter(
+            author__profile__isnull=True
+        ).values_list('author_id', flat=True).distinct().order_by())
+        authors.update(Follow.objects.filter(
+            author__profile__isnull=True
+        ).values_list('author_id', flat=True).distinct().order_by())
+        profiles = [Profile(user_id=author_id) for author_id in authors]
+        Profile.objects.bulk_create(profiles, ignore_conflicts=True)
+        return len(profiles)
+
+    def repair_celebrities(self):
+        promoted = Profile.objects.filter(
+            celebrity=False,
+            followers_count__gte=settings.FANOUT_FOLLOWERS_LIMIT,
+        ).update(celebrity=True)
+        demoted = list(Profile.objects.filter(
+            celebrity=True, followers_count__lt=timelines.demotion_limit()
+        ).values_list('user_id', flat=True))
+        for author_id in demoted:
+            timelines.demote(author_id)
+        return promoted, len(demoted)
+
+    def repair(self, queryset, field):
+        drifted = []
+        for obj in queryset.exclude(**{field: F('total')}).iterator():
+            setattr(obj, field, obj.total)
+            drifted.append(obj)
+        queryset.model.objects.bulk_update(drifted, [field], batch_size=500)
+        return len(drifted)
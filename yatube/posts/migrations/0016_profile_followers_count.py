@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:35
+
+from django.db import migrations, models
+
+
+def fill_followers_count(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Profile = apps.get_model('posts', 'Profile')
+    authors = Follow.objects.order_by().values('author').annotate(
+        total=models.Count('id')
+    )
+    for row in authors:
+        profile, _ = Profile.objects.get_or_create(user_id=row['author'])
+        profile.followers_count = row['total']
+        profile.save(update_fields=['followers_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_auto_20261017_0433'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Число подписчиков'),
+        ),
+        migrations.RunPython(fill_followers_count, migrations.RunPython.noop),
+    ]
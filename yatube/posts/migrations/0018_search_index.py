@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_search USING fts5(text, comments)'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, text, comments) '
+        'SELECT post.id, post.text, coalesce(('
+        "SELECT group_concat(comment.text, ' ') "
+        'FROM posts_comment AS comment WHERE comment.post_id = post.id'
+        "), '') FROM posts_post AS post"
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
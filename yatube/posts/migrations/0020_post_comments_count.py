@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:20
+
+from django.db import migrations, models
+
+
+def fill_comments_count(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Post = apps.get_model('posts', 'Post')
+    totals = Comment.objects.filter(
+        post=models.OuterRef('pk')
+    ).order_by().values('post').annotate(total=models.Count('id'))
+    Post.objects.filter(comments__isnull=False).distinct().update(
+        comments_count=models.Subquery(totals.values('total'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_comment_post_page_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число комментариев'),
+        ),
+        migrations.RunPython(fill_comments_count, migrations.RunPython.noop),
+    ]
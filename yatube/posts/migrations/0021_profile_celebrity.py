@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_celebrities(apps, schema_editor):
+    Profile = apps.get_model('posts', 'Profile')
+    Profile.objects.filter(
+        followers_count__gte=settings.FANOUT_FOLLOWERS_LIMIT
+    ).update(celebrity=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='celebrity',
+            field=models.BooleanField(default=False, help_text='Переключается сигналами, см. posts.timelines.', verbose_name='Посты подмешиваются при чтении'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+
+def split_index(apps, schema_editor):
+    """По строке индекса на пост и на каждый комментарий."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE posts_search')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_search '
+        'USING fts5(text, post_id UNINDEXED)'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, text, post_id) '
+        'SELECT id, text, id FROM posts_post'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, text, post_id) '
+        'SELECT -id, text, post_id FROM posts_comment'
+    )
+
+
+def join_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE posts_search')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_search USING fts5(text, comments)'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, text, comments) '
+        'SELECT post.id, post.text, coalesce(('
+        "SELECT group_concat(comment.text, ' ') "
+        'FROM posts_comment AS comment WHERE comment.post_id = post.id'
+        "), '') FROM posts_post AS post"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_profile_celebrity'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_index, join_index),
+    ]
@@ -4,7 +4,32 @@ from django.db import models
 User = get_user_model()
 
 
-class Group(models.Model):
+class CountersModel(models.Model):
+    """Модель с денормализованными счётчиками в counter_fields.
+
+    Счётчики (и флаги, которые от них зависят) меняют только сигналы
+    через update() и repair_counters, поэтому
+    save() существующей строки их не пишет: иначе значение из
+    устаревшего экземпляра стёрло бы параллельное приращение.
+    """
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not args
+                and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class Group(CountersModel):
     title = models.CharField(
         max_length=200,
         verbose_name='Заголовок'
@@ -16,6 +41,13 @@ class Group(models.Model):
         verbose_name='Текст поста',
         help_text='Напишите здесь ваш текст'
     )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число постов',
+    )
+
+    counter_fields = ('posts_count',)
 
     class Meta():
         verbose_name = 'Группа'
@@ -25,7 +57,49 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class Profile(CountersModel):
+    """Денормализованные счётчики автора.
+
+    Держатся в актуальном состоянии сигналами posts.signals,
+    расхождения исправляет команда repair_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число постов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков',
+    )
+    celebrity = models.BooleanField(
+        default=False,
+        verbose_name='Посты подмешиваются при чтении',
+        help_text='Переключается сигналами, см. posts.timelines.',
+    )
+
+    counter_fields = ('posts_count', 'followers_count', 'celebrity')
+
+    class Meta():
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self) -> str:
+        return str(self.user)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_cards(self):
+        """Посты с группой и автором, как их показывают ленты."""
+        return self.select_related('group', 'author')
+
+
+class Post(CountersModel):
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Напишите здесь ваш текст'
@@ -35,6 +109,10 @@ class Post(models.Model):
         verbose_name='Дата публикации',
         db_index=True,
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -56,9 +134,27 @@ class Post(models.Model):
         blank=True,
         help_text='Картинку к посту можно добавить здесь.'
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев',
+    )
+
+    objects = PostQuerySet.as_manager()
+    counter_fields = ('comments_count',)
 
     class Meta():
         ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='post_author_feed_idx',
+            ),
+            models.Index(
+                fields=['group', 'pub_date', 'id'],
+                name='post_group_feed_idx',
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -90,6 +186,12 @@ class Comment(models.Model):
 
     class Meta():
         ordering = ['created']
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_page_idx',
+            ),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -119,3 +221,53 @@ class Follow(models.Model):
         ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписчика.
+
+    Строки раскладываются при публикации поста и при подписке, поэтому
+    лента подписок читается одним проходом по индексу
+    (user, pub_date, post). Автор и дата продублированы из поста.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique timeline post')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_feed_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_author_idx',
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
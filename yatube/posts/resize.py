@@ -0,0 +1,119 @@
+"""Уменьшенные копии картинок постов по подписанным ссылкам.
+
+Параметры (файл, ширина, высота, обрезка, формат) упакованы в
+подписанный токен, поэтому новый размер в шаблоне не требует ни
+изменения кода, ни массовой перегенерации, а подобрать чужие размеры
+и нагрузить сервер перекодированием нельзя.
+
+Первый запрос рисует копию в дисковый кэш RESIZE_ROOT, следующие
+отдают готовый файл. Одновременные запросы одной копии ждут файловую
+блокировку, и картинка кодируется один раз даже в разных процессах.
+"""
+import fcntl
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+SALT = 'posts.resize'
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+
+def resized_url(name, width, height, crop=True, image_format='JPEG'):
+    token = signing.dumps(
+        [name, width, height, crop, image_format], salt=SALT, compress=True
+    )
+    return reverse('posts:resized_image', args=(token,))
+
+
+def read_token(token):
+    """Параметры из токена, для чужого или битого токена вернёт None."""
+    try:
+        name, width, height, crop, image_format = signing.loads(
+            token, salt=SALT
+        )
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    Image.init()
+    if image_format not in EXTENSIONS or image_format not in Image.SAVE:
+        return None
+    sides = (width, height)
+    if not all(0 < side <= settings.RESIZE_MAX_SIDE for side in sides):
+        return None
+    return name, width, height, crop, image_format
+
+
+def variant_path(name, width, height, crop, image_format):
+    digest = hashlib.sha1(
+        f'{name}|{width}x{height}|{crop}'.encode()
+    ).hexdigest()
+    return os.path.join(
+        settings.RESIZE_ROOT,
+        digest[:2],
+        f'{digest}.{EXTENSIONS[image_format]}',
+    )
+
+
+def get_variant(name, width, height, crop, image_format):
+    """Путь к готовой копии; рисует её, если копии ещё нет.
+
+    Вернёт None, если исходного файла нет.
+    """
+    path = variant_path(name, width, height, crop, image_format)
+    if os.path.exists(path):
+        return path
+    if not default_storage.exists(name):
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock_path = f'{path}.lock'
+    with open(lock_path, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # Пока ждали блокировку, копию мог нарисовать другой запрос.
+            if not os.path.exists(path):
+                render(name, path, width, height, crop, image_format)
+        finally:
+            # Файл блокировки удаляется под блокировкой: кто придёт
+            # позже, найдёт готовую копию и блокировку брать не станет.
+            try:
+                os.unlink(lock_path)
+            except FileNotFoundError:
+                pass
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return path
+
+
+def render(name, path, width, height, crop, image_format):
+    with default_storage.open(name) as source:
+        image = Image.open(source)
+        # JPEG раскодируется сразу в уменьшенном разрешении. Сторона
+        # берётся большая: до поворота по EXIF ширина и высота могут
+        # быть переставлены.
+        side = max(width, height)
+        image.draft('RGB', (side, side))
+        image = ImageOps.exif_transpose(image)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        if crop:
+            image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        else:
+            image.thumbnail((width, height), Image.LANCZOS)
+        # Пишем во временный файл рядом и переименовываем: читатели
+        # никогда не увидят недописанную картинку.
+        descriptor, temporary = tempfile.mkstemp(
+            dir=os.path.dirname(path)
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as output:
+                image.save(output, image_format, quality=85)
+            os.chmod(temporary, 0o644)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
@@ -0,0 +1,185 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+На SQLite посты и комментарии индексируются в виртуальной таблице FTS5
+posts_search — по строке на каждый: у поста rowid равен его id, у
+комментария — минус id комментария, в колонке post_id (не
+индексируется) лежит id поста, к которому относится текст. Поэтому
+сохранение или удаление комментария меняет одну строку индекса, а не
+пересобирает текст всего обсуждения. Индекс обновляют сигналы
+posts.signals; после массовых изменений в обход моделей
+(queryset.update, bulk_create) его пересобирает команда
+rebuild_search_index.
+
+Поиск отдаёт id постов по релевантности (bm25 лучшего совпадения
+поста или его комментария) одним запросом к индексу без просмотра
+таблицы постов. На других базах, где FTS5 нет, ищется обычным
+icontains.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import Comment, Post
+
+TABLE = 'posts_search'
+
+WORD = re.compile(r'\w+')
+
+
+def enabled():
+    return connection.vendor == 'sqlite'
+
+
+def match_query(query):
+    """Безопасный запрос MATCH: все слова, каждое как префикс.
+
+    Пользовательский ввод не разбирается как синтаксис FTS5, поэтому
+    кавычки и операторы в нём не приводят к ошибке.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD.findall(query.lower()))
+
+
+def _fill_posts(cursor, where='', params=()):
+    cursor.execute(
+        f'INSERT INTO {TABLE} (rowid, text, post_id) '
+        f'SELECT id, text, id FROM {Post._meta.db_table} {where}',
+        params,
+    )
+
+
+def _fill_comments(cursor, where='', params=()):
+    cursor.execute(
+        f'INSERT INTO {TABLE} (rowid, text, post_id) '
+        f'SELECT -id, text, post_id FROM {Comment._meta.db_table} {where}',
+        params,
+    )
+
+
+def _reindex(fill, rowids, ids):
+    if not enabled() or not ids:
+        return
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid IN ({placeholders})', rowids
+        )
+        fill(cursor, f'WHERE id IN ({placeholders})', ids)
+
+
+def index_posts(post_ids):
+    """Переиндексирует тексты постов; удалённые уходят из индекса."""
+    post_ids = list(post_ids)
+    _reindex(_fill_posts, post_ids, post_ids)
+
+
+def index_comments(comment_ids):
+    """Переиндексирует комментарии; удалённые уходят из индекса."""
+    comment_ids = list(comment_ids)
+    _reindex(_fill_comments, [-pk for pk in comment_ids], comment_ids)
+
+
+def drop_post_comments(post_id):
+    """Убирает из индекса все комментарии поста одним запросом."""
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid IN (SELECT -id FROM '
+            f'{Comment._meta.db_table} WHERE post_id = %s)',
+            [post_id],
+        )
+
+
+def rebuild():
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        _fill_posts(cursor)
+        _fill_comments(cursor)
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+
+def post_ids(query, start=0, stop=None):
+    """id найденных постов с start по stop, самые релевантные первыми."""
+    stop = settings.SEARCH_MAX_RESULTS if stop is None else stop
+    match = match_query(query)
+    if not match or stop <= start:
+        return []
+    if not enabled():
+        return list(fallback(query).values_list('pk', flat=True)[start:stop])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT post_id FROM {TABLE} WHERE {TABLE} MATCH %s '
+            f'GROUP BY post_id ORDER BY min(rank) LIMIT %s OFFSET %s',
+            [match, stop - start, start],
+        )
+        return [pk for pk, in cursor.fetchall()]
+
+
+def matching(queryset, query):
+    """Все посты queryset, подходящие под запрос, без ограничения числа.
+
+    Для админки: отбор идёт подзапросом к индексу, а порядок и
+    постраничный вывод остаются за queryset.
+    """
+    match = match_query(query)
+    if not match:
+        return queryset.none()
+    if not enabled():
+        return queryset.filter(pk__in=fallback(query).values('pk'))
+    # RawSQL обернул бы подзапрос во вторые скобки, и SQLite взял бы из
+    # него только первую строку.
+    return queryset.extra(
+        where=[
+            f'{Post._meta.db_table}.id IN '
+            f'(SELECT post_id FROM {TABLE} WHERE {TABLE} MATCH %s)'
+        ],
+        params=[match],
+    )
+
+
+def fallback(query):
+    return Post.objects.filter(
+        Q(text__icontains=query) | Q(comments__text__icontains=query)
+    ).distinct()
+
+
+class SearchResults:
+    """Найденные посты для Paginator.
+
+    Число результатов ограничено SEARCH_MAX_RESULTS: подсчёт всех
+    совпадений частого слова на миллионах постов стоил бы дороже
+    самой выдачи.
+    """
+
+    def __init__(self, query, queryset=None):
+        self.query = query
+        self.queryset = Post.objects.all() if queryset is None else queryset
+
+    def count(self):
+        match = match_query(self.query)
+        if not match:
+            return 0
+        limit = settings.SEARCH_MAX_RESULTS
+        if not enabled():
+            return len(fallback(self.query).values('pk')[:limit])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM (SELECT DISTINCT post_id '
+                f'FROM {TABLE} WHERE {TABLE} MATCH %s LIMIT %s)',
+                [match, limit],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        ids = post_ids(self.query, index.start or 0, index.stop)
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
@@ -0,0 +1,246 @@
+import threading
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from core.cache import bump_generation
+from . import search, timelines
+from .models import Comment, Follow, Group, Post, Profile, User
+from .utils import count_cache_key, count_generation
+
+# Поля пользователя, которые показываются в лентах и RSS.
+AUTHOR_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+# id постов, которые удаляются в этом потоке: их комментарии уходят
+# каскадом, и поштучно менять счётчик и поисковый индекс незачем.
+_deleting = threading.local()
+
+
+def deleting_posts():
+    """id удаляемых постов, ключи слабого словаря id -> PostDeletion."""
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = weakref.WeakValueDictionary()
+    return _deleting.posts
+
+
+class PostDeletion:
+    """Отметка об удалении поста, живая до конца его транзакции.
+
+    Сильную ссылку на отметку держит только список on_commit
+    соединения. После коммита отметка сама убирает id, а при откате
+    Django выбрасывает её из списка, и id пропадает из слабого
+    словаря: комментарии поста, который так и не удалился, снова
+    меняют счётчик и индекс.
+    """
+
+    def __init__(self, pk):
+        self.pk = pk
+
+    def __call__(self):
+        deleting_posts().pop(self.pk, None)
+
+
+def change_posts_count(author_id, group_id, delta):
+    """Атомарно сдвигает счётчики постов автора и группы на delta."""
+    if delta > 0:
+        Profile.objects.get_or_create(user_id=author_id)
+    counters = [Profile.objects.filter(user_id=author_id)]
+    if group_id is not None:
+        counters.append(Group.objects.filter(pk=group_id))
+    for queryset in counters:
+        if delta < 0:
+            queryset = queryset.filter(posts_count__gte=-delta)
+        queryset.update(posts_count=F('posts_count') + delta)
+
+
+def change_group(previous_group_id, group_id):
+    Group.objects.filter(
+        pk=previous_group_id, posts_count__gt=0
+    ).update(posts_count=F('posts_count') - 1)
+    Group.objects.filter(pk=group_id).update(
+        posts_count=F('posts_count') + 1
+    )
+
+
+def change_followers_count(author_id, delta):
+    if delta > 0:
+        Profile.objects.get_or_create(user_id=author_id)
+    profiles = Profile.objects.filter(user_id=author_id)
+    if delta < 0:
+        profiles = profiles.filter(followers_count__gte=-delta)
+    profiles.update(followers_count=F('followers_count') + delta)
+    return Profile.objects.filter(user_id=author_id).values_list(
+        'followers_count', 'celebrity'
+    ).first() or (0, False)
+
+
+def change_comments_count(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def feed_count_keys(post):
+    """Ключи кэшированных счётчиков лент, в которых виден пост.
+
+    Счётчики лент подписчиков «звёзд» не сбрасываются поштучно —
+    они доживают до POSTS_COUNT_TIMEOUT.
+    """
+    keys = ['index']
+    if timelines.is_celebrity(post.author_id):
+        return [count_cache_key(key) for key in keys]
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    keys.extend(f'follow:{user_id}' for user_id in followers)
+    return [count_cache_key(key) for key in keys]
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_group(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._previous_group_id = None
+        return
+    instance._previous_group_id = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', flat=True).first()
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_name(sender, instance, update_fields=None, **kwargs):
+    instance._previous_name = None
+    if instance.pk is None or (
+        update_fields is not None
+        and not set(update_fields) & set(AUTHOR_NAME_FIELDS)
+    ):
+        return
+    instance._previous_name = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*AUTHOR_NAME_FIELDS).first()
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        change_posts_count(instance.author_id, instance.group_id, 1)
+        timelines.fan_out(instance)
+        cache.delete_many(feed_count_keys(instance))
+    elif instance._previous_group_id != instance.group_id:
+        change_group(instance._previous_group_id, instance.group_id)
+
+
+@receiver(pre_delete, sender=Post)
+def start_post_delete(sender, instance, **kwargs):
+    deletion = PostDeletion(instance.pk)
+    deleting_posts()[instance.pk] = deletion
+    transaction.on_commit(deletion)
+    search.drop_post_comments(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    deleting_posts().pop(instance.pk, None)
+    change_posts_count(instance.author_id, instance.group_id, -1)
+    cache.delete_many(feed_count_keys(instance))
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.post_id not in deleting_posts():
+        change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_feed_generation(sender, **kwargs):
+    bump_generation('feed', 'page')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_syndication_generation(sender, **kwargs):
+    bump_generation('syndication')
+
+
+@receiver(post_save, sender=User)
+def bump_author_generations(sender, instance, **kwargs):
+    """Сбрасывает ленты, страницы и RSS, где показано старое имя автора.
+
+    Карточки постов сами меняют ключ вместе с именем, см. post_cards.
+    """
+    previous = getattr(instance, '_previous_name', None)
+    current = tuple(getattr(instance, field) for field in AUTHOR_NAME_FIELDS)
+    if previous is not None and previous != current:
+        bump_generation('feed', 'page', 'syndication')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_count_generation(sender, created=True, **kwargs):
+    """Сбрасывает кэшированные числа строк в списках админки."""
+    if created:
+        bump_generation(count_generation(sender))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_posts([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    if instance.post_id not in deleting_posts():
+        search.index_comments([instance.pk])
+
+
+@receiver(post_save, sender=Follow)
+def fill_timeline(sender, instance, created, **kwargs):
+    if created:
+        followers_count, celebrity = change_followers_count(
+            instance.author_id, 1
+        )
+        if (not celebrity
+                and followers_count >= settings.FANOUT_FOLLOWERS_LIMIT):
+            timelines.promote(instance.author_id)
+        timelines.backfill(instance)
+        cache.delete(count_cache_key(f'follow:{instance.user_id}'))
+        bump_generation(f'follow:{instance.user_id}', 'page')
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    followers_count, celebrity = change_followers_count(
+        instance.author_id, -1
+    )
+    if celebrity and followers_count < timelines.demotion_limit():
+        timelines.schedule_demotion(instance.author_id)
+    timelines.prune(instance)
+    cache.delete(count_cache_key(f'follow:{instance.user_id}'))
+    bump_generation(f'follow:{instance.user_id}', 'page')
@@ -0,0 +1,71 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from ..thumbnails import card_thumbnails
+
+register = template.Library()
+
+
+def card_cache_key(post, link_post, author):
+    # Имя автора и название группы показываются в карточке: после их
+    # смены ключ другой. Автор и группа уже выбраны через for_cards.
+    names = hashlib.md5('|'.join((
+        post.author.username,
+        post.author.get_full_name(),
+        post.group.title if post.group_id else '',
+    )).encode()).hexdigest()
+    return (
+        f'post_card:{post.pk}:{post.updated.timestamp()}:'
+        f'{post.comments_count}:{names}:'
+        f'{int(bool(link_post))}{int(author is None)}'
+    )
+
+
+def card_complete(post, thumbnails):
+    if not post.image:
+        return True
+    thumb = thumbnails.get(post.pk)
+    return thumb is not None and thumb.complete
+
+
+@register.simple_tag
+def post_cards(posts, link_post=False, author=None):
+    """HTML карточек постов для страницы ленты.
+
+    Карточка кэшируется под ключом из id поста, времени его изменения,
+    числа комментариев, имени автора, названия группы и вида карточки,
+    поэтому одна и та же карточка служит всем лентам. Карточки страницы
+    читаются одним get_many, рендерятся только промахи, а их миниатюры
+    ищутся одной пачкой. Карточки, чьи миниатюры ещё не готовы, не
+    кэшируются.
+    """
+    keys = {
+        card_cache_key(post, link_post, author): post for post in posts
+    }
+    cards = cache.get_many(keys)
+    thumbnails = card_thumbnails(
+        post for key, post in keys.items() if key not in cards
+    )
+    missed = {
+        key: render_to_string('includes/post_card.html', {
+            'post': post,
+            'link_post': link_post,
+            'author': author,
+            'thumb': thumbnails.get(post.pk),
+        })
+        for key, post in keys.items() if key not in cards
+    }
+    cache.set_many(
+        {
+            key: card for key, card in missed.items()
+            if card_complete(keys[key], thumbnails)
+        },
+        settings.POST_CARD_CACHE_TIMEOUT,
+    )
+    cards.update(missed)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,26 @@
+from django import template
+from django.conf import settings
+
+from ..resize import resized_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def resized(image, width, height, crop=True, image_format='JPEG'):
+    """Подписанная ссылка на копию картинки нужного размера."""
+    if not image:
+        return ''
+    return resized_url(image.name, width, height, crop, image_format)
+
+
+@register.simple_tag
+def resized_card(image):
+    """Ссылка на копию картинки в размере карточки.
+
+    Нужна, пока миниатюры sorl ещё готовятся в фоне: вместо исходного
+    файла читатель скачивает копию размера карточки.
+    """
+    geometry, options = settings.POST_THUMBNAILS['card']
+    width, height = (int(side) for side in geometry.split('x'))
+    return resized(image, width, height, crop='crop' in options)
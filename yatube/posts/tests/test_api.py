@@ -0,0 +1,146 @@
+from http import HTTPStatus
+
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.query_budget import QueryBudgetTestMixin
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.star = User.objects.create_user(username='star')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.star)
+        cls.posts = []
+        for number in range(7):
+            author = cls.author if number % 2 else cls.star
+            cls.posts.append(Post.objects.create(
+                text=f'Пост {number}',
+                author=author,
+                group=cls.group if number < 4 else None,
+            ))
+        cls.posts.reverse()
+        cls.post = cls.posts[0]
+        for number in range(3):
+            Comment.objects.create(
+                text=f'Комментарий {number}', post=cls.post, author=cls.reader
+            )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def walk(self, address, params=None, key='results'):
+        """Все элементы ленты, пройденной по ссылкам next."""
+        response = self.client.get(address, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        data = response.json()
+        items = list(data[key])
+        while data['next']:
+            data = self.client.get(data['next']).json()
+            items.extend(data[key])
+        return items
+
+    def test_feeds(self):
+        """Ленты отдают все свои посты по курсору в порядке новизны."""
+        feeds = {
+            reverse('posts:api_index'): self.posts,
+            reverse('posts:api_group_posts', args=(self.group.slug,)): [
+                post for post in self.posts if post.group_id
+            ],
+            reverse('posts:api_profile', args=(self.author.username,)): [
+                post for post in self.posts if post.author == self.author
+            ],
+            reverse('posts:api_follow_index'): self.posts,
+        }
+        for address, expected in feeds.items():
+            with self.subTest(address=address):
+                items = self.walk(address, {'limit': 2})
+                self.assertEqual(
+                    [item['id'] for item in items],
+                    [post.pk for post in expected],
+                )
+
+    @override_settings(FANOUT_FOLLOWERS_LIMIT=2)
+    def test_follow_feed_merges_celebrities(self):
+        """Посты «звёзд» подмешиваются в ленту подписок API."""
+        Follow.objects.create(
+            user=User.objects.create_user(username='fan'), author=self.star
+        )
+        items = self.walk(reverse('posts:api_follow_index'), {'limit': 3})
+        self.assertEqual(
+            [item['id'] for item in items], [post.pk for post in self.posts]
+        )
+
+    def test_fields(self):
+        """fields оставляет в ответе только выбранные поля."""
+        response = self.client.get(
+            reverse('posts:api_index'), {'fields': 'id,author', 'limit': 1}
+        )
+        self.assertEqual(
+            response.json()['results'],
+            [{'id': self.post.pk, 'author': self.post.author.username}],
+        )
+        response = self.client.get(
+            reverse('posts:api_index'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_post_detail(self):
+        """Пост отдаётся с комментариями от старых к новым."""
+        address = reverse('posts:api_post_detail', args=(self.post.pk,))
+        response = self.client.get(
+            address, {'fields': 'text', 'comment_fields': 'text'}
+        )
+        self.assertEqual(response.json()['post'], {'text': self.post.text})
+        comments = self.walk(
+            address, {'comment_fields': 'text', 'limit': 2}, 'comments'
+        )
+        self.assertEqual(
+            [comment['text'] for comment in comments],
+            [f'Комментарий {number}' for number in range(3)],
+        )
+        response = self.client.get(
+            reverse('posts:api_post_detail', args=(10 ** 6,))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIn('error', response.json())
+
+    def test_errors(self):
+        """Неверные параметры и аноним в ленте подписок — ошибки JSON."""
+        address = reverse('posts:api_index')
+        for params in ({'cursor': 'плохой'}, {'limit': 'много'}):
+            with self.subTest(params=params):
+                response = self.client.get(address, params)
+                self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = Client().get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_query_budgets(self):
+        """Число запросов не зависит от размера страницы."""
+        pages = {
+            'posts:api_index': reverse('posts:api_index'),
+            'posts:api_group_posts': reverse(
+                'posts:api_group_posts', args=(self.group.slug,)
+            ),
+            'posts:api_profile': reverse(
+                'posts:api_profile', args=(self.author.username,)
+            ),
+            'posts:api_follow_index': reverse('posts:api_follow_index'),
+            'posts:api_post_detail': reverse(
+                'posts:api_post_detail', args=(self.post.pk,)
+            ),
+        }
+        for view_name, address in pages.items():
+            for limit in (1, 100):
+                with self.subTest(view_name=view_name, limit=limit):
+                    with self.assertQueryBudget(view_name):
+                        self.client.get(address, {'limit': limit})
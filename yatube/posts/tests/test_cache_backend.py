@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from core.backends.sqlite import SQLiteCache
+
+
+def hammer(cache, times):
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(
+            os.path.join(self.directory, 'cache.sqlite3'),
+            {'OPTIONS': options},
+        )
+
+    def test_set_get_and_expire(self):
+        """Запись читается до истечения срока и пропадает после."""
+        self.cache.set('post', {'text': 'Текст'})
+        self.cache.set('gone', 'значение', 0)
+        self.assertEqual(self.cache.get('post'), {'text': 'Текст'})
+        self.assertIsNone(self.cache.get('gone'))
+        self.assertEqual(
+            self.cache.get_many(['post', 'gone', 'missing']),
+            {'post': {'text': 'Текст'}},
+        )
+        self.assertTrue(self.cache.add('gone', 'снова'))
+        self.assertFalse(self.cache.add('post', 'другое'))
+
+    def test_big_integers(self):
+        """Числа за пределами 8 байт сохраняются без переполнения."""
+        for value in (2 ** 63 - 1, 2 ** 63, -2 ** 63 - 1, 2 ** 70):
+            self.cache.set('number', value)
+            self.assertEqual(self.cache.get('number'), value)
+
+    def test_shared_between_instances(self):
+        """Запись одного процесса видна другому, сброс — тоже."""
+        other = self.make_cache()
+        self.cache.set('generation', 1, None)
+        self.assertEqual(other.incr('generation'), 2)
+        self.assertEqual(self.cache.get('generation'), 2)
+        other.delete('generation')
+        self.assertFalse(self.cache.has_key('generation'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('generation')
+
+    def test_incr_is_atomic_across_processes(self):
+        """Одновременные incr из разных процессов не теряются."""
+        self.cache.set('counter', 0, None)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=hammer, args=(self.cache, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_evicts_least_recently_used(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        cache = self.make_cache(
+            MAX_ENTRIES=3, CULL_FREQUENCY=3, ACCESS_RESOLUTION=0
+        )
+        for key in ('first', 'second', 'third'):
+            cache.set(key, key)
+        cache.get('first')
+        cache.set('fourth', 'fourth')
+        self.assertEqual(
+            set(cache.get_many(['first', 'second', 'third', 'fourth'])),
+            {'first', 'third', 'fourth'},
+        )
+
+    def test_size_limit(self):
+        """Суммарный размер значений не превышает MAX_SIZE."""
+        cache = self.make_cache(MAX_SIZE=10000)
+        for number in range(20):
+            cache.set(f'fragment:{number}', 'x' * 1000)
+        self.assertLessEqual(cache.stats()['size'], 10000)
+        self.assertIsNotNone(cache.get('fragment:19'))
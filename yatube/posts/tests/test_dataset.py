@@ -0,0 +1,82 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase
+
+from ..management.commands.load_test import percentile
+from ..models import Comment, Follow, Group, Post, User
+
+
+def generate(**options):
+    arguments = []
+    for name, value in options.items():
+        arguments += [f'--{name.replace("_", "-")}', str(value)]
+    call_command('generate_dataset', *arguments, stdout=StringIO())
+
+
+class GenerateDatasetTest(TestCase):
+    def test_counts_and_skew(self):
+        """Набор нужного размера, активность авторов неравномерна."""
+        generate(users=50, groups=3, posts=500, comments=300, follows=5)
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 500)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        counts = sorted(
+            Post.objects.order_by().values('author').annotate(
+                total=Count('id')
+            ).values_list('total', flat=True),
+            reverse=True,
+        )
+        self.assertGreater(counts[0], 5 * counts[len(counts) // 2])
+        post = Post.objects.order_by('-comments_count').first()
+        self.assertEqual(post.comments_count, post.comments.count())
+        self.assertEqual(
+            post.author.profile.posts_count, post.author.posts.count()
+        )
+
+    def test_repeatable(self):
+        """С одним seed получаются одинаковые наборы."""
+        generate(users=10, posts=30, comments=10, prefix='a')
+        generate(users=10, posts=30, comments=10, prefix='b')
+        texts = {
+            prefix: list(Post.objects.filter(
+                author__username__startswith=prefix
+            ).order_by('pk').values_list('text', flat=True))
+            for prefix in 'ab'
+        }
+        self.assertEqual(texts['a'], texts['b'])
+
+
+class LoadTestTest(LiveServerTestCase):
+    def load(self, *args):
+        # Живой сервер теста делит с тестом одно соединение с базой в
+        # памяти, поэтому клиент один: параллельные записи его ломают.
+        stdout = StringIO()
+        call_command(
+            'load_test', '--base-url', self.live_server_url,
+            '--concurrency', '1', *args, stdout=stdout,
+        )
+        return stdout.getvalue().splitlines()[-1].split()
+
+    def test_load_test(self):
+        """Нагрузка проходит без ошибок, комментарии добавляются."""
+        generate(users=10, groups=2, posts=50, comments=20, follows=3)
+        self.assertEqual(
+            self.load('--requests', '30')[:3], ['всего', '30', '0']
+        )
+        comments = Comment.objects.count()
+        self.load('--requests', '2', '--mix', 'add_comment=1')
+        self.assertEqual(Comment.objects.count(), comments + 2)
+
+
+class PercentileTest(SimpleTestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([7], 0.95), 7)
+        self.assertEqual(percentile([], 0.5), 0)
@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        group = Group.objects.create(
+            title='Группа', slug='export', description='Описание'
+        )
+        cls.image_post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.author,
+            group=group,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        cls.post = Post.objects.create(
+            text='Пост, с запятой и "кавычками"', author=cls.author
+        )
+        Comment.objects.create(
+            text='Свой комментарий', post=cls.post, author=cls.author
+        )
+        Post.objects.create(
+            text='Чужой пост',
+            author=User.objects.create_user(username='stranger'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def download(self, export_format, client=None):
+        response = (client or self.client).get(
+            reverse('posts:profile_export', args=(self.author.username,)),
+            {'format': export_format},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_json(self):
+        """JSON содержит только посты и комментарии автора."""
+        archive = json.loads(self.download('json'))
+        self.assertEqual(archive['author'], self.author.username)
+        self.assertEqual(
+            [post['id'] for post in archive['posts']],
+            [self.image_post.pk, self.post.pk],
+        )
+        self.assertEqual(archive['posts'][0]['group__slug'], 'export')
+        self.assertEqual(
+            [comment['text'] for comment in archive['comments']],
+            ['Свой комментарий'],
+        )
+
+    def test_csv(self):
+        """CSV экранирует текст и помечает тип строки."""
+        rows = list(csv.DictReader(
+            io.StringIO(self.download('csv').decode())
+        ))
+        self.assertEqual(
+            [row['type'] for row in rows], ['post', 'post', 'comment']
+        )
+        self.assertEqual(rows[1]['text'], self.post.text)
+        self.assertEqual(rows[2]['post'], str(self.post.pk))
+
+    def test_zip(self):
+        """В zip лежат archive.json и картинки постов."""
+        with zipfile.ZipFile(io.BytesIO(self.download('zip'))) as archive:
+            self.assertEqual(
+                archive.namelist(),
+                ['archive.json', self.image_post.image.name],
+            )
+            self.assertEqual(
+                archive.read(self.image_post.image.name), SMALL_GIF
+            )
+            posts = json.loads(archive.read('archive.json'))['posts']
+            self.assertEqual(len(posts), 2)
+
+    @mock.patch('posts.export.FILE_CHUNK', 64)
+    def test_streamed_in_chunks(self):
+        """Выгрузка отдаётся кусками, а не одной строкой."""
+        response = self.client.get(
+            reverse('posts:profile_export', args=(self.author.username,))
+        )
+        self.assertGreater(len(list(response.streaming_content)), 1)
+
+    def test_access(self):
+        """Выгрузку видят только сам автор и модераторы."""
+        address = reverse(
+            'posts:profile_export', args=(self.author.username,)
+        )
+        stranger = Client()
+        stranger.force_login(User.objects.get(username='stranger'))
+        self.assertEqual(stranger.get(address).status_code, 403)
+        self.assertEqual(Client().get(address).status_code, 302)
+        staff = Client()
+        staff.force_login(User.objects.create_user(
+            username='support', is_staff=True
+        ))
+        self.assertIn(b'writer', self.download('json', staff))
+        response = self.client.get(address, {'format': 'xml'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_command(self):
+        """Команда export_author пишет ту же выгрузку в файл."""
+        output = os.path.join(TEMP_MEDIA_ROOT, 'writer.csv')
+        call_command(
+            'export_author', self.author.username, '--format', 'csv',
+            '--output', output, stdout=io.StringIO(),
+        )
+        with open(output, 'rb') as exported:
+            self.assertEqual(exported.read(), self.download('csv'))
@@ -0,0 +1,116 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post, User
+
+
+class FeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='poster')
+        cls.group = Group.objects.create(
+            title='Группа', slug='feeds', description='Описание группы'
+        )
+        cls.post = Post.objects.create(
+            text='Пост в группе', author=cls.author, group=cls.group
+        )
+        cls.other = Post.objects.create(
+            text='Пост другого автора',
+            author=User.objects.create_user(username='other'),
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_feeds(self):
+        """Ленты отдают посты своей выборки в RSS и Atom."""
+        feeds = {
+            reverse('posts:index_rss'): (True, True),
+            reverse('posts:group_rss', args=(self.group.slug,)): (
+                True, False
+            ),
+            reverse('posts:author_rss', args=(self.author.username,)): (
+                True, False
+            ),
+        }
+        for address, (has_post, has_other) in feeds.items():
+            for url, content_type in (
+                (address, 'application/rss+xml'),
+                (address.replace('rss', 'atom'), 'application/atom+xml'),
+            ):
+                with self.subTest(url=url):
+                    response = self.client.get(url)
+                    self.assertTrue(
+                        response['Content-Type'].startswith(content_type)
+                    )
+                    content = response.content.decode()
+                    self.assertEqual(self.post.text in content, has_post)
+                    self.assertEqual(self.other.text in content, has_other)
+
+    def test_author_rename(self):
+        """Смена имени автора сбрасывает закэшированные ленты."""
+        address = reverse('posts:index_atom')
+        self.client.get(address)
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Новое имя'
+        author.save()
+        self.assertContains(self.client.get(address), 'Новое имя')
+
+    def test_cache_per_host(self):
+        """Ссылки в ленте ведут на хост и схему запроса, а не из кэша."""
+        address = reverse('posts:index_rss')
+        self.client.get(address, HTTP_HOST='localhost')
+        for host, secure, link in (
+            ('127.0.0.1', False, 'http://127.0.0.1/'),
+            ('localhost', True, 'https://localhost/'),
+        ):
+            with self.subTest(host=host, secure=secure):
+                response = self.client.get(
+                    address, HTTP_HOST=host, secure=secure
+                )
+                self.assertContains(response, link)
+
+    def test_missing_group(self):
+        response = self.client.get(reverse('posts:group_rss', args=('no',)))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_cached_feed_read_once(self):
+        """Поколение и закэшированная лента читаются один раз за запрос."""
+        address = reverse('posts:index_rss')
+        self.client.get(address)
+        with mock.patch.object(cache, 'get', wraps=cache.get) as get:
+            self.client.get(address)
+        keys = [
+            call[0][0] for call in get.call_args_list
+            if call[0][0].startswith('generation')
+        ]
+        self.assertEqual(len(keys), 2, keys)
+
+    def test_conditional_get(self):
+        """Повторный опрос отвечает 304 без рендеринга, новый пост — 200."""
+        address = reverse('posts:index_rss')
+        response = self.client.get(address)
+        with self.assertNumQueries(0):
+            cached = self.client.get(address)
+        self.assertEqual(cached.content, response.content)
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(
+                address, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+        not_modified = self.client.get(
+            address, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(text='Свежий пост', author=self.author)
+        response = self.client.get(
+            address, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Свежий пост')
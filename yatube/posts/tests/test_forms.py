@@ -1,13 +1,24 @@
+import os
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.core.cache import cache
-from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadedfile import (
+    SimpleUploadedFile, TemporaryUploadedFile,
+)
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
 
+from core.uploadhandlers import LimitedTemporaryFileUploadHandler
 from ..models import Comment, Group, Post, User
+from ..templatetags.resized import resized_card
+from ..thumbnails import card_thumbnails, make_thumbnails
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -148,3 +159,231 @@ class PostFormTests(TestCase):
             response,
             (f'/auth/login/?next=/posts/{self.test_post.id}/comment/')
         )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTests(TestCase):
+    small_gif = (
+        b'\x47\x49\x46\x38\x39\x61\x02\x00'
+        b'\x01\x00\x80\x00\x00\x00\x00\x00'
+        b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+        b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+        b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+        b'\x0A\x00\x3B'
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def thumbnail_path(self, post):
+        geometry, options = settings.POST_THUMBNAILS['card']
+        thumbnail = get_thumbnail(post.image, geometry, **options)
+        return os.path.join(TEMP_MEDIA_ROOT, thumbnail.name)
+
+    @mock.patch(
+        'core.background.transaction.on_commit',
+        side_effect=lambda func: func(),
+    )
+    def test_thumbnails_made_on_upload(self, on_commit):
+        """Миниатюры создаются сразу после загрузки картинки."""
+        uploaded = SimpleUploadedFile(
+            name='upload.gif',
+            content=self.small_gif,
+            content_type='image/gif',
+        )
+        with mock.patch('posts.thumbnails.make_thumbnails') as make:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'С картинкой', 'image': uploaded},
+            )
+        post = Post.objects.get(text='С картинкой')
+        make.assert_called_once_with(post.image.name)
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=(post.pk,)),
+            data={'text': 'Без новой картинки'},
+        )
+        self.assertEqual(on_commit.call_count, 1)
+
+    def test_generate_thumbnails_command(self):
+        """Команда восстанавливает потерянные файлы миниатюр."""
+        uploaded = SimpleUploadedFile(
+            name='lost.gif',
+            content=self.small_gif,
+            content_type='image/gif',
+        )
+        post = Post.objects.create(
+            text='Старый пост', author=self.user, image=uploaded
+        )
+        path = self.thumbnail_path(post)
+        os.remove(path)
+        call_command('generate_thumbnails', workers=1, stdout=mock.Mock())
+        self.assertTrue(os.path.exists(path))
+
+    def test_card_thumbnails_batched(self):
+        """Миниатюры страницы читаются пачкой без запроса на пост."""
+        posts = []
+        for number in range(3):
+            posts.append(Post.objects.create(
+                text=f'Пост {number}',
+                author=self.user,
+                image=SimpleUploadedFile(
+                    name=f'batch_{number}.gif',
+                    content=self.small_gif,
+                    content_type='image/gif',
+                ),
+            ))
+            make_thumbnails(posts[-1].image.name)
+        posts.append(
+            Post.objects.create(text='Без картинки', author=self.user)
+        )
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails = card_thumbnails(posts)
+        with self.assertNumQueries(0):
+            card_thumbnails(posts)
+        geometry, options = settings.POST_THUMBNAILS['card']
+        self.assertEqual(set(thumbnails), {post.pk for post in posts[:3]})
+        for post in posts[:3]:
+            expected = get_thumbnail(post.image, geometry, **options)
+            self.assertEqual(thumbnails[post.pk].url, expected.url)
+            self.assertEqual(thumbnails[post.pk].width, 960)
+
+    def test_missing_thumbnails_not_made_on_render(self):
+        """Показ не создаёт миниатюры, а ставит их в очередь."""
+        post = Post.objects.create(
+            text='Картинка без миниатюр',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='pending.gif',
+                content=self.small_gif,
+                content_type='image/gif',
+            ),
+        )
+        with mock.patch('posts.thumbnails.get_thumbnail') as make, \
+                mock.patch('posts.thumbnails._schedule') as schedule:
+            for _ in range(2):
+                response = self.authorized_client.get(
+                    reverse('posts:post_detail', args=(post.pk,))
+                )
+        make.assert_not_called()
+        schedule.assert_called_once_with(post.image.name)
+        # Вместо исходного файла — копия размера карточки.
+        self.assertContains(response, resized_card(post.image))
+        self.assertNotContains(response, post.image.url)
+
+    def test_card_image_variants(self):
+        """Карточка получает srcset из всех ширин и доступных форматов."""
+        post = Post.objects.create(
+            text='Адаптивная картинка',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='variants.gif',
+                content=self.small_gif,
+                content_type='image/gif',
+            ),
+        )
+        make_thumbnails(post.image.name)
+        thumb = card_thumbnails([post])[post.pk]
+        self.assertEqual((thumb.width, thumb.height), (960, 339))
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertIn(f' {width}w', thumb.srcset)
+        formats = [
+            image_format for image_format in settings.POST_IMAGE_FORMATS
+            if image_format in Image.SAVE
+        ]
+        self.assertEqual(
+            [mime for mime, _ in thumb.sources],
+            [Image.MIME[image_format] for image_format in formats],
+        )
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        self.assertContains(response, f'srcset="{thumb.srcset}"')
+        self.assertContains(response, 'width="960" height="339"')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, name, size=(40, 20), image_format='PNG', **save):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'blue').save(buffer, image_format, **save)
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': name,
+                'image': SimpleUploadedFile(name, buffer.getvalue()),
+            },
+        )
+
+    @override_settings(UPLOAD_MAX_SIZE=200)
+    def test_upload_size_limit(self):
+        """Слишком большой файл не сохраняется и не держится в памяти."""
+        response = self.upload('huge.png', size=(300, 300))
+        upload = response.wsgi_request.FILES['image']
+        self.assertIsInstance(upload, TemporaryUploadedFile)
+        self.assertGreater(upload.size, 200)
+        self.assertTrue(
+            response.context['form'].errors['image'][0].startswith('Файл')
+        )
+        self.assertFalse(Post.objects.filter(text='huge.png').exists())
+
+    @override_settings(UPLOAD_MAX_SIZE=200)
+    def test_upload_handler_discards_overflow(self):
+        """Сверх предела на диск ничего не пишется, размер честный."""
+        handler = LimitedTemporaryFileUploadHandler()
+        handler.new_file('image', 'huge.png', 'image/png', None)
+        for start in range(0, 1000, 100):
+            handler.receive_data_chunk(b'x' * 100, start)
+        upload = handler.file_complete(1000)
+        self.assertEqual(upload.size, 1000)
+        self.assertEqual(
+            os.path.getsize(upload.temporary_file_path()), 200
+        )
+        upload.close()
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=400)
+    def test_pixel_limit(self):
+        """Картинки больше предела по пикселям отклоняются."""
+        response = self.upload('wide.png', size=(30, 20))
+        self.assertIn(
+            'мегапикселей', response.context['form'].errors['image'][0]
+        )
+
+    def test_exif_orientation_normalized(self):
+        """Картинка с EXIF-поворотом сохраняется уже повёрнутой."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        self.upload(
+            'rotated.jpg', size=(40, 20), image_format='JPEG',
+            exif=exif.tobytes(),
+        )
+        post = Post.objects.get(text='rotated.jpg')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (20, 40))
+            self.assertEqual(image.getexif().get(0x0112, 1), 1)
@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.cache import get_generation
+from .. import search
+from ..models import Comment, Follow, Post, TimelineEntry, User
+from ..utils import count_cache_key
+
+
+class ImportCommunityTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write('\n'.join(lines) + '\n')
+        return path
+
+    def jsonl(self, name, records):
+        return self.write(name, [
+            json.dumps(record, ensure_ascii=False) for record in records
+        ])
+
+    def run_import(self, model, path, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'import_community', model, path, *args,
+            stdout=stdout, stderr=stderr,
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_community(self):
+        """Импорт создаёт строки, авторов и всё, что делают сигналы."""
+        self.run_import('group', self.write('groups.csv', [
+            'slug,title,description',
+            'cats,Кошки,Про кошек',
+        ]))
+        self.run_import('post', self.jsonl('posts.jsonl', [
+            {'id': 10, 'author': 'anna', 'text': 'Первый пост про кошек',
+             'group': 'cats', 'pub_date': '2020-01-02T03:04:05'},
+            {'id': 11, 'author': 'boris', 'text': 'Второй пост'},
+            {'id': 12, 'author': 'anna', 'text': 'Пост', 'group': 'dogs'},
+        ]))
+        self.run_import('comment', self.jsonl('comments.jsonl', [
+            {'post': 10, 'author': 'boris', 'text': 'Мурлыкающий ответ',
+             'created': '2020-01-03T00:00:00+00:00'},
+            {'post': 999, 'author': 'boris', 'text': 'Нет поста'},
+        ]))
+        _, errors = self.run_import('follow', self.write('follows.csv', [
+            'user,author',
+            'boris,anna',
+            'boris,anna',
+            'anna,anna',
+        ]))
+        self.assertEqual(errors.count('Пропущена запись'), 1)
+        post = Post.objects.get(pk=10)
+        self.assertEqual(post.author.username, 'anna')
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(
+            post.pub_date, datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        )
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.group.posts_count, 1)
+        self.assertFalse(Post.objects.filter(pk=12).exists())
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(post.author.profile.followers_count, 1)
+        self.assertEqual(post.author.profile.posts_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user__username='boris', post=post
+        ).exists())
+        self.assertEqual(search.post_ids('мурлыкающий'), [post.pk])
+        self.assertFalse(
+            User.objects.get(username='anna').has_usable_password()
+        )
+
+    def test_resume(self):
+        """Повторный запуск и --resume не создают дубликатов."""
+        path = self.jsonl('posts.jsonl', [
+            {'id': number, 'author': 'anna', 'text': f'Пост {number}'}
+            for number in range(1, 6)
+        ])
+        self.run_import('post', path, '--batch-size', '2')
+        self.run_import('post', path, '--batch-size', '2')
+        self.assertEqual(Post.objects.count(), 5)
+        with open(f'{path}.progress', 'w') as progress:
+            progress.write('4')
+        output, _ = self.run_import('post', path, '--resume')
+        self.assertIn('обработано записей 5', output)
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_import_keeps_unrelated_cache(self):
+        """Импорт сбрасывает кэш лент, но не весь кэш."""
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='anna')
+        Follow.objects.create(user=reader, author=author)
+        follow_key = count_cache_key(f'follow:{reader.pk}')
+        cache.set_many({
+            'unrelated': 'value',
+            count_cache_key('index'): 1,
+            follow_key: 1,
+        })
+        feed = get_generation('feed')
+        self.run_import('post', self.jsonl('posts.jsonl', [
+            {'id': 1, 'author': 'anna', 'text': 'Новый пост'},
+        ]))
+        self.assertEqual(cache.get('unrelated'), 'value')
+        self.assertIsNone(cache.get(count_cache_key('index')))
+        self.assertIsNone(cache.get(follow_key))
+        self.assertNotEqual(get_generation('feed'), feed)
@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models.signals import post_delete
 from django.test import TestCase
 
-from ..models import Comment, Group, Post
+from ..models import Comment, Group, Post, Profile
 
 User = get_user_model()
 
@@ -49,3 +54,106 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 verbose_name = comment._meta.get_field(value).verbose_name
                 self.assertEqual(verbose_name, expected)
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='counter')
+        self.group = Group.objects.create(
+            title='Первая группа',
+            slug='first',
+            description='Описание',
+        )
+        self.other_group = Group.objects.create(
+            title='Вторая группа',
+            slug='second',
+            description='Описание',
+        )
+
+    def assertCounters(self, author, group, other_group):
+        self.user.profile.refresh_from_db()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.user.profile.posts_count, author)
+        self.assertEqual(self.group.posts_count, group)
+        self.assertEqual(self.other_group.posts_count, other_group)
+
+    def test_counters_follow_posts(self):
+        """Счётчики постов меняются при создании, переносе и удалении."""
+        post = Post.objects.create(
+            text='Пост', author=self.user, group=self.group
+        )
+        Post.objects.create(text='Пост без группы', author=self.user)
+        self.assertCounters(2, 1, 0)
+        post.group = self.other_group
+        post.save()
+        self.assertCounters(2, 0, 1)
+        post.delete()
+        self.assertCounters(1, 0, 0)
+
+    def test_repair_counters(self):
+        """Команда repair_counters исправляет разошедшиеся счётчики."""
+        Post.objects.create(text='Пост', author=self.user, group=self.group)
+        Profile.objects.all().delete()
+        Group.objects.update(posts_count=7)
+        call_command('repair_counters', stdout=StringIO())
+        self.assertCounters(1, 1, 0)
+
+    def test_comments_count(self):
+        """Счётчик комментариев следует за комментариями и чинится."""
+        post = Post.objects.create(text='Пост', author=self.user)
+        comments = [
+            Comment.objects.create(text='Текст', post=post, author=self.user)
+            for _ in range(3)
+        ]
+        comments[0].delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        Post.objects.update(comments_count=10)
+        call_command('repair_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+
+    def test_rolled_back_post_delete(self):
+        """После отката удаления поста комментарии снова меняют счётчик."""
+        post = Post.objects.create(text='Пост', author=self.user)
+        comments = [
+            Comment.objects.create(text='Текст', post=post, author=self.user)
+            for _ in range(2)
+        ]
+
+        def fail(**kwargs):
+            raise RuntimeError('Сбой при удалении')
+
+        post_delete.connect(fail, sender=Comment)
+        try:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                post.delete()
+        finally:
+            post_delete.disconnect(fail, sender=Comment)
+        Comment.objects.get(pk=comments[0].pk).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_stale_save_keeps_comments_count(self):
+        """Сохранение устаревшего поста не стирает счётчик комментариев."""
+        post = Post.objects.create(text='Пост', author=self.user)
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(text='Текст', post=post, author=self.user)
+        stale.text = 'Правка'
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.text, 'Правка')
+
+    def test_stale_save_keeps_posts_count(self):
+        """Переименование устаревших группы и профиля не трогает счётчики."""
+        Post.objects.create(text='Пост', author=self.user, group=self.group)
+        stale_group = Group.objects.get(pk=self.group.pk)
+        stale_profile = Profile.objects.get(user=self.user)
+        Post.objects.create(text='Пост 2', author=self.user, group=self.group)
+        stale_group.title = 'Новое название'
+        stale_group.save()
+        stale_profile.save()
+        self.assertCounters(2, 2, 0)
+        self.assertEqual(self.group.title, 'Новое название')
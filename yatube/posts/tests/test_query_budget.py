@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.query_budget import QueryBudgetExceeded, QueryBudgetTestMixin
+from ..models import Comment, Follow, Group, Post, Profile, User
+from ..thumbnails import make_thumbnails
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class QueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='budget',
+            description='Описание',
+        )
+        for number in range(5):
+            author = User.objects.create_user(username=f'author_{number}')
+            Follow.objects.create(user=cls.user, author=author)
+            # У половины постов картинки: карточки с миниатюрами тоже
+            # должны укладываться в бюджет.
+            image = ''
+            if number % 2:
+                image = SimpleUploadedFile(
+                    name=f'budget_{number}.gif',
+                    content=SMALL_GIF,
+                    content_type='image/gif',
+                )
+            cls.post = Post.objects.create(
+                text=f'Пост {number}',
+                author=author,
+                group=cls.group,
+                image=image,
+            )
+            if image:
+                cls.image_post = cls.post
+            Comment.objects.create(
+                text='Комментарий', post=cls.post, author=cls.user
+            )
+        # Посты «звезды» подмешиваются в ленту подписок при чтении.
+        Profile.objects.filter(user=author).update(celebrity=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_views_within_budget(self):
+        """Ленты и страница поста укладываются в бюджет запросов.
+
+        И пока миниатюры картинок не созданы, и когда они готовы.
+        """
+        self.check_pages()
+        for post in Post.objects.exclude(image=''):
+            make_thumbnails(post.image.name)
+        self.check_pages()
+
+    def check_pages(self):
+        pages = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_posts': reverse(
+                'posts:group_posts', kwargs={'slug': self.group.slug}
+            ),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': self.post.author}
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.image_post.pk}
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+            'posts:post_comments': reverse(
+                'posts:post_comments', kwargs={'post_id': self.post.pk}
+            ),
+        }
+        for view_name, address in pages.items():
+            with self.subTest(view_name=view_name):
+                # Бюджет рассчитан на холодный кэш: страница сама читает
+                # данные миниатюр из базы.
+                cache.clear()
+                with self.assertQueryBudget(view_name):
+                    self.authorized_client.get(address)
+
+    @override_settings(
+        QUERY_BUDGETS={'posts:index': 0}, QUERY_BUDGET_STRICT=True
+    )
+    def test_strict_budget(self):
+        """В строгом режиме превышение бюджета роняет запрос."""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('posts:index'))
@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from PIL import Image
+
+from ..models import Post, User
+from ..resize import get_variant, read_token, render, resized_url
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    RESIZE_ROOT=f'{TEMP_MEDIA_ROOT}/resized',
+)
+class ResizeTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        buffer = BytesIO()
+        Image.new('RGB', (400, 300), 'red').save(buffer, 'JPEG')
+        cls.post = Post.objects.create(
+            text='Картинка',
+            author=User.objects.create(username='painter'),
+            image=SimpleUploadedFile(
+                name='big.jpg',
+                content=buffer.getvalue(),
+                content_type='image/jpeg',
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_resized_image(self):
+        """Копия рисуется по подписанной ссылке и кэшируется надолго."""
+        url = Template(
+            '{% load resized %}{% resized post.image 100 50 %}'
+        ).render(Context({'post': self.post}))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        image = Image.open(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(image.size, (100, 50))
+        with mock.patch('posts.resize.render') as render_mock:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        render_mock.assert_not_called()
+
+    def test_bad_token(self):
+        """Подделанная ссылка или лишний размер не обрабатываются."""
+        url = resized_url(self.post.image.name, 100, 50)
+        token = url.rstrip('/').rsplit('/', 1)[-1]
+        self.assertEqual(
+            self.client.get(url.replace(token, token[:-1] + 'x')).status_code,
+            404,
+        )
+        too_big = resized_url(
+            self.post.image.name, settings.RESIZE_MAX_SIDE + 1, 50
+        )
+        self.assertEqual(self.client.get(too_big).status_code, 404)
+        missing = resized_url('posts/missing.jpg', 100, 50)
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+    def test_concurrent_requests_render_once(self):
+        """Одновременные запросы одной копии кодируют её один раз."""
+        params = read_token(
+            resized_url(self.post.image.name, 60, 60, crop=False)
+            .rstrip('/').rsplit('/', 1)[-1]
+        )
+        calls = []
+
+        def slow_render(*args):
+            calls.append(args)
+            time.sleep(0.1)
+            render(*args)
+
+        with mock.patch('posts.resize.render', side_effect=slow_render):
+            threads = [
+                threading.Thread(target=get_variant, args=params)
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+        path = get_variant(*params)
+        self.assertEqual(Image.open(path).size, (60, 45))
+        self.assertFalse(os.path.exists(f'{path}.lock'))
@@ -1,16 +1,29 @@
+from http import HTTPStatus
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.paginator import Page
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import urlencode
 
+from core.cache import get_generation, page_cache_stats
+from core.templatetags.paginator_tags import page_window
+from .. import timelines
 from ..forms import CommentForm, PostForm
-from ..models import Comment, Follow, Group, Post, User
+from ..templatetags.post_cards import card_cache_key
+from ..thumbnails import make_thumbnails
+from ..models import (
+    Comment, Follow, Group, Post, Profile, TimelineEntry, User,
+)
+from ..utils import FeedPaginator, count_cache_key
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -201,6 +214,23 @@ class PostPagesTest(TestCase):
         self.assertIn('comments', response.context)
         self.assertIn(comment, response.context['comments'])
 
+    def test_comments_count_on_cards(self):
+        """Карточки в лентах показывают число комментариев."""
+        self.authorized_client.get(reverse('posts:index'))
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Комментарий'},
+        )
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.authorized_client.get(address)
+                self.assertContains(response, 'Комментариев: 1')
+
     def test_cache(self):
         """Тестирование кэша"""
         post = Post.objects.create(
@@ -209,13 +239,82 @@ class PostPagesTest(TestCase):
         )
         response = self.authorized_client.get(reverse('posts:index'))
         temp = response.content
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='Изменён без сигналов')
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response.content, temp)
         cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, temp)
 
+    def test_cache_generation(self):
+        """Кэш лент сбрасывается при изменении постов и комментариев."""
+        post = Post.objects.create(
+            text='Пост для тестирования кеша',
+            author=self.user,
+            group=self.group,
+        )
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for address in addresses:
+            self.authorized_client.get(address)
+        post.delete()
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.authorized_client.get(address)
+                self.assertNotContains(response, post.text)
+        generation = get_generation('feed')
+        Comment.objects.create(
+            text='Комментарий', post=self.post, author=self.user
+        )
+        self.assertGreater(get_generation('feed'), generation)
+
+    def test_post_card_cache(self):
+        """Карточки постов кэшируются и общие для разных лент.
+
+        Пока миниатюры картинки не готовы, карточка не кэшируется.
+        """
+        post = Post.objects.get(pk=self.post.pk)
+        key = card_cache_key(post, True, None)
+        self.authorized_client.get(reverse('posts:index'))
+        self.assertIsNone(cache.get(key))
+        make_thumbnails(post.image.name)
+        self.authorized_client.get(reverse('posts:index'))
+        card = cache.get(key)
+        self.assertIn(post.text, card)
+        cache.set(key, 'Карточка из кэша')
+        Follow.objects.create(user=self.user, author=User.objects.create(
+            username='Second'
+        ))
+        TimelineEntry.objects.create(
+            user=self.user, post=post, author=post.author,
+            pub_date=post.pub_date,
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Карточка из кэша')
+        post.text = 'Новый текст'
+        post.save()
+        self.assertNotEqual(card_cache_key(post, True, None), key)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новый текст')
+
+    def test_post_card_follows_names(self):
+        """Новые имя автора и название группы сразу видны в карточках."""
+        make_thumbnails(self.post.image.name)
+        address = reverse('posts:index')
+        self.authorized_client.get(address)
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name, author.last_name = 'Лев', 'Толстой'
+        author.save()
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        response = self.authorized_client.get(address)
+        self.assertContains(response, 'Лев Толстой')
+        self.assertContains(response, 'все записи группы Новое название')
+
 
 class PaginatorTest(TestCase):
     MORE_POSTS = 6
@@ -237,6 +336,9 @@ class PaginatorTest(TestCase):
                 group=cls.group,
             )
 
+    def setUp(self):
+        cache.clear()
+
     def test_correct_paginator(self):
         """Paginator работает корректно."""
         pag_address = {
@@ -256,6 +358,60 @@ class PaginatorTest(TestCase):
                     len(response.context['page_obj']), PaginatorTest.MORE_POSTS
                 )
 
+    def test_cursor_paginator(self):
+        """Лента листается по курсору вперёд и назад."""
+        address = reverse('posts:index')
+        response = self.client.get(address)
+        first_page = list(response.context['page_obj'])
+        paginator = response.context['page_obj'].paginator
+        self.assertTrue(paginator.cursor_mode)
+        self.assertIsNone(paginator.previous_cursor)
+        response = self.client.get(
+            address, {'before': paginator.next_cursor}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), PaginatorTest.MORE_POSTS)
+        self.assertFalse(page_obj.has_next())
+        self.assertTrue(page_obj.has_previous())
+        self.assertNotIn(first_page[-1], page_obj)
+        response = self.client.get(
+            address, {'after': page_obj.paginator.previous_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']), first_page)
+
+    def test_cached_page_count(self):
+        """Число постов берётся из кэша и сбрасывается новым постом."""
+        address = reverse('posts:index')
+        self.client.get(address, {'page': 1})
+        self.assertEqual(
+            cache.get(count_cache_key('index')),
+            settings.NUMBER_POSTS + PaginatorTest.MORE_POSTS
+        )
+        Post.objects.create(text='Ещё один пост', author=self.user)
+        self.assertIsNone(cache.get(count_cache_key('index')))
+        response = self.client.get(address, {'page': 2})
+        self.assertEqual(
+            response.context['page_obj'].paginator.count,
+            settings.NUMBER_POSTS + PaginatorTest.MORE_POSTS + 1
+        )
+
+    def test_page_window(self):
+        """Paginator выводит только соседние номера страниц."""
+        paginator = FeedPaginator(range(100), 1)
+        self.assertEqual(
+            list(page_window(paginator.page(50), 2)), [48, 49, 50, 51, 52]
+        )
+        self.assertEqual(list(page_window(paginator.page(1), 2)), [1, 2, 3])
+
+    def test_broken_cursor(self):
+        """Битый курсор открывает первую страницу ленты."""
+        response = self.client.get(
+            reverse('posts:index'), {'before': 'broken'}
+        )
+        self.assertEqual(
+            len(response.context['page_obj']), settings.NUMBER_POSTS
+        )
+
 
 class FollowViewsTests(TestCase):
     @classmethod
@@ -343,3 +499,462 @@ class FollowViewsTests(TestCase):
         )
         post_count1 = len(response.context.get('page_obj').object_list)
         self.assertEqual(post_count, post_count1)
+
+    def test_new_post_fan_out(self):
+        """Новый пост раскладывается в ленты подписчиков."""
+        Follow.objects.create(user=self.follower, author=self.user)
+        post = Post.objects.create(text='Свежий пост', author=self.user)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post
+        ).exists())
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.no_follower, post=post
+        ).exists())
+        response = self.authorized_client_follower.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.post]
+        )
+
+    @override_settings(
+        FANOUT_FOLLOWERS_LIMIT=2, FANOUT_HYSTERESIS=0, TIMELINE_WORKERS=0
+    )
+    @mock.patch(
+        'core.background.transaction.on_commit',
+        side_effect=lambda func: func(),
+    )
+    def test_celebrity_posts_merged_on_read(self, on_commit):
+        """Посты «звёзд» не раскладываются, а подмешиваются при чтении."""
+        Follow.objects.create(user=self.follower, author=self.no_follower)
+        other_post = Post.objects.create(
+            text='Пост обычного автора', author=self.no_follower
+        )
+        Follow.objects.create(user=self.follower, author=self.user)
+        Follow.objects.create(user=self.no_follower, author=self.user)
+        post = Post.objects.create(text='Пост звезды', author=self.user)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=post).exists()
+        )
+        response = self.authorized_client_follower.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [post, other_post, self.post]
+        )
+        Follow.objects.filter(user=self.no_follower).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post
+        ).exists())
+        self.assertFalse(Profile.objects.get(user=self.user).celebrity)
+
+    @override_settings(
+        FANOUT_FOLLOWERS_LIMIT=3, FANOUT_HYSTERESIS=1, TIMELINE_WORKERS=0
+    )
+    @mock.patch(
+        'core.background.transaction.on_commit',
+        side_effect=lambda func: func(),
+    )
+    def test_celebrity_hysteresis(self, on_commit):
+        """У порога «звезда» не возвращается в ленты при каждой отписке."""
+        readers = [self.follower, self.no_follower] + [
+            User.objects.create(username=f'reader{number}')
+            for number in range(2)
+        ]
+        for reader in readers[:3]:
+            Follow.objects.create(user=reader, author=self.user)
+        post = Post.objects.create(text='Пост звезды', author=self.user)
+        Follow.objects.filter(user=readers[2]).delete()
+        Follow.objects.create(user=readers[3], author=self.user)
+        Follow.objects.filter(user=readers[3]).delete()
+        self.assertEqual(on_commit.call_count, 0)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        response = self.authorized_client_follower.get(
+            reverse('posts:follow_index')
+        )
+        self.assertIn(post, list(response.context['page_obj']))
+        Follow.objects.filter(user=readers[1]).delete()
+        self.assertEqual(on_commit.call_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post
+        ).exists())
+
+    @override_settings(TIMELINE_BACKFILL=2)
+    @mock.patch('posts.timelines.BACKFILL_ALL_ROWS', 1)
+    def test_backfill_all(self):
+        """backfill_all раскладывает последние посты обычных авторов."""
+        posts = [
+            Post.objects.create(text=f'Пост {number}', author=self.user)
+            for number in range(2)
+        ]
+        Post.objects.create(text='Пост звезды', author=self.no_follower)
+        Follow.objects.create(user=self.follower, author=self.user)
+        Follow.objects.create(user=self.no_follower, author=self.user)
+        Follow.objects.create(user=self.follower, author=self.no_follower)
+        Profile.objects.filter(user=self.no_follower).update(celebrity=True)
+        TimelineEntry.objects.exclude(
+            user=self.follower, post=posts[1]
+        ).delete()
+        timelines.backfill_all()
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('user_id', 'post_id')),
+            {
+                (reader.pk, post.pk)
+                for reader in (self.follower, self.no_follower)
+                for post in posts
+            },
+        )
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='User')
+        cls.post = Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_page_cache(self):
+        """Страница для анонима берётся из кэша до изменения постов."""
+        address = reverse('posts:index')
+        self.assertEqual(self.client.get(address)['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(address)['X-Page-Cache'], 'HIT')
+        self.assertEqual(
+            self.client.get(address, {'before': 'x'})['X-Page-Cache'],
+            'MISS'
+        )
+        Post.objects.create(text='Новый пост', author=self.user)
+        response = self.client.get(address)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Новый пост')
+        self.assertEqual(page_cache_stats(), {'hits': 1, 'misses': 3})
+
+    def test_page_cache_skips_sessions(self):
+        """Запросы с сессией идут мимо кэша страниц."""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='User')
+        cls.post = Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_not_modified(self):
+        """Неизменившаяся лента отвечает 304 до изменения постов."""
+        address = reverse('posts:index')
+        etag = self.client.get(address)['ETag']
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertIsNone(response.context)
+        Post.objects.create(text='Новый пост', author=self.user)
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_post_detail_not_modified(self):
+        """Страница поста отвечает 304, пока нет новых комментариев."""
+        address = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        response = self.client.get(address)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        response = self.client.get(
+            address, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Comment.objects.create(
+            text='Комментарий', post=self.post, author=self.user
+        )
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_post_detail_etag_follows_names(self):
+        """ETag страницы поста меняется с именем автора и группой."""
+        group = Group.objects.create(title='Группа', slug='etag-group')
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        address = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        etag = self.client.get(address)['ETag']
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Лев'
+        author.save()
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        etag = response['ETag']
+        group.slug = 'renamed'
+        group.save()
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.python = Post.objects.create(
+            text='Питон и снова питон', author=cls.user
+        )
+        cls.other = Post.objects.create(
+            text='Про питон один раз', author=cls.user
+        )
+        cls.commented = Post.objects.create(text='Без слова', author=cls.user)
+        Comment.objects.create(
+            text='А в комментарии есть черепаха',
+            post=cls.commented,
+            author=cls.user,
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def found(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_search_ranked(self):
+        """Поиск находит посты по тексту и ставит релевантные выше."""
+        self.assertEqual(self.found('питон'), [self.python.pk, self.other.pk])
+        self.assertEqual(self.found('пит'), [self.python.pk, self.other.pk])
+        self.assertEqual(self.found('питон раз'), [self.other.pk])
+
+    def test_search_comments(self):
+        """Пост находится по тексту комментария и теряется с ним."""
+        self.assertEqual(self.found('черепаха'), [self.commented.pk])
+        self.commented.comments.all().delete()
+        self.assertEqual(self.found('черепаха'), [])
+
+    def test_post_found_once(self):
+        """Пост с совпадением и в тексте, и в комментарии — один раз."""
+        Comment.objects.create(
+            text='Тоже питон', post=self.python, author=self.user
+        )
+        self.assertEqual(self.found('питон'), [self.python.pk, self.other.pk])
+
+    def test_comment_rows(self):
+        """Комментарий — своя строка индекса, удаляется вместе с постом."""
+        post = Post.objects.create(text='Обсуждение', author=self.user)
+        comment = Comment.objects.create(
+            text='Про ежа', post=post, author=self.user
+        )
+        comment.text = 'Про ужа'
+        comment.save()
+        self.assertEqual(self.found('ужа'), [post.pk])
+        self.assertEqual(self.found('ежа'), [])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM posts_search')
+            rows = cursor.fetchone()[0]
+            post.delete()
+            cursor.execute('SELECT count(*) FROM posts_search')
+            self.assertEqual(cursor.fetchone()[0], rows - 2)
+
+    def test_index_follows_changes(self):
+        """Изменённые и удалённые посты сразу видны в поиске."""
+        post = Post.objects.get(pk=self.other.pk)
+        post.text = 'Теперь про змею'
+        post.save()
+        self.assertEqual(self.found('змею'), [post.pk])
+        self.assertEqual(self.found('питон'), [self.python.pk])
+        post.delete()
+        self.assertEqual(self.found('змею'), [])
+
+    def test_unsafe_query(self):
+        """Кавычки и операторы FTS в запросе не ломают поиск."""
+        for query in ('"питон', 'питон OR', 'NEAR(', '***', ''):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': query}
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(NUMBER_POSTS=1)
+    def test_pagination_keeps_query(self):
+        """Ссылки на страницы поиска сохраняют запрос."""
+        response = self.client.get(reverse('posts:search'), {'q': 'питон'})
+        self.assertContains(
+            response, f'?{urlencode({"q": "питон"})}&amp;page=2'
+        )
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'питон', 'page': 2}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [self.other.pk],
+        )
+
+    def test_admin_search(self):
+        """Поиск в админке идёт по тому же индексу."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'черепаха'}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list],
+            [self.commented.pk],
+        )
+        with self.settings(SEARCH_MAX_RESULTS=1):
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'питон'}
+            )
+        self.assertEqual(
+            {post.pk for post in response.context['cl'].result_list},
+            {self.python.pk, self.other.pk},
+        )
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.group = Group.objects.create(
+            title='Группа', slug='admin-group', description='Описание'
+        )
+        Group.objects.create(
+            title='Другая', slug='admin-other', description='Описание'
+        )
+        cls.add_rows(2)
+
+    @classmethod
+    def add_rows(cls, number):
+        for _ in range(number):
+            author = User.objects.create_user(
+                username=f'author_{User.objects.count()}'
+            )
+            post = Post.objects.create(
+                text='Пост', author=author, group=cls.group
+            )
+            Comment.objects.create(text='Текст', post=post, author=author)
+            Follow.objects.create(user=cls.admin, author=author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+        cache.clear()
+
+    def queries(self, model_name):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                reverse(f'admin:posts_{model_name}_changelist')
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [query['sql'] for query in context.captured_queries]
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов списка не зависит от числа строк."""
+        for model_name in ('post', 'comment', 'follow'):
+            with self.subTest(model_name=model_name):
+                before = len(self.queries(model_name))
+                self.add_rows(3)
+                cache.clear()
+                self.assertEqual(len(self.queries(model_name)), before)
+
+    def test_count_cached(self):
+        """COUNT делается один раз и повторяется после новой строки."""
+        def counts():
+            return [
+                sql for sql in self.queries('post')
+                if sql.startswith('SELECT COUNT(*)') and 'posts_post' in sql
+            ]
+        self.assertEqual(len(counts()), 1)
+        self.assertEqual(counts(), [])
+        self.add_rows(1)
+        self.assertEqual(len(counts()), 1)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_group_still_editable(self):
+        """Группу можно сменить прямо из списка постов."""
+        post = Post.objects.first()
+        other = Group.objects.get(slug='admin-other')
+        data = {
+            'form-TOTAL_FORMS': 1,
+            'form-INITIAL_FORMS': 1,
+            'form-0-id': post.pk,
+            'form-0-group': other.pk,
+            '_save': 'Сохранить',
+        }
+        self.client.post(reverse('admin:posts_post_changelist'), data)
+        post.refresh_from_db()
+        self.assertEqual(post.group, other)
+
+    def test_profile_counters_read_only(self):
+        """Счётчики и флаг «звезды» профиля в админке не редактируются."""
+        profile = Profile.objects.first()
+        response = self.client.get(
+            reverse('admin:posts_profile_change', args=(profile.pk,))
+        )
+        form = response.context['adminform'].form
+        for field in ('posts_count', 'followers_count', 'celebrity'):
+            with self.subTest(field=field):
+                self.assertNotIn(field, form.fields)
+
+
+@override_settings(COMMENTS_PER_PAGE=20)
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(text=f'Комментарий {number}', post=cls.post,
+                    author=cls.user)
+            for number in range(45)
+        )
+        cls.comments = list(
+            cls.post.comments.order_by('created', 'id')
+            .values_list('pk', flat=True)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_pages_follow_cursor(self):
+        """Первая страница на странице поста, следующие — фрагментами."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        page = response.context['comments']
+        self.assertEqual([c.pk for c in page], self.comments[:20])
+        fragment = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.pk}
+        )
+        self.assertContains(
+            response, f'{fragment}?comments={page.paginator.next_cursor}'
+        )
+        shown = [c.pk for c in page]
+        while page.has_next():
+            response = self.client.get(
+                fragment, {'comments': page.paginator.next_cursor}
+            )
+            self.assertTemplateUsed(response, 'includes/comment_list.html')
+            page = response.context['comments']
+            shown.extend(c.pk for c in page)
+        self.assertEqual(shown, self.comments)
+        self.assertNotContains(response, 'js-more-comments')
+
+    def test_fragment_of_missing_post(self):
+        """Фрагмент комментариев несуществующего поста — 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 10 ** 6})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,215 @@
+"""Миниатюры картинок постов.
+
+Шаблоны строят миниатюры через sorl-thumbnail при рендеринге, и без
+подготовки первый читатель нового поста ждёт, пока Pillow раскодирует,
+обрежет и сожмёт картинку. Поэтому миниатюры всех размеров из
+POST_THUMBNAILS создаются сразу после сохранения картинки в фоновом
+пуле потоков, а шаблон находит их готовыми в хранилище ключей sorl.
+
+Для страницы ленты данные миниатюр (адрес и размеры) читаются пачкой:
+одним get_many из кэша хранилища ключей и одним запросом к его таблице
+для промахов, а не отдельным обращением на каждую карточку.
+
+Картинка карточки готовится в нескольких ширинах POST_IMAGE_WIDTHS —
+в формате миниатюр по умолчанию и в форматах POST_IMAGE_FORMATS, если
+их умеет сохранять установленный Pillow. Шаблон отдаёт их через
+srcset, и телефон не скачивает картинку для широкого экрана.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedKVStore
+from sorl.thumbnail.models import KVStore
+
+from core import background
+from core.cache import bump_generation
+
+# Сколько показы не ставят повторно в очередь миниатюры картинки.
+PENDING_TIMEOUT = 10 * 60
+
+
+def card_variants():
+    """Варианты картинки карточки: [(формат, ширина, геометрия, опции)].
+
+    Формат None — формат миниатюр sorl по умолчанию, как у карточки.
+    """
+    geometry, options = settings.POST_THUMBNAILS['card']
+    width, height = (int(side) for side in geometry.split('x'))
+    Image.init()
+    formats = [None] + [
+        image_format for image_format in settings.POST_IMAGE_FORMATS
+        if image_format in Image.SAVE
+    ]
+    variants = []
+    for image_format in formats:
+        variant_options = dict(options)
+        if image_format is not None:
+            variant_options['format'] = image_format
+        for variant_width in settings.POST_IMAGE_WIDTHS:
+            variant_height = round(variant_width * height / width)
+            variants.append((
+                image_format,
+                variant_width,
+                f'{variant_width}x{variant_height}',
+                variant_options,
+            ))
+    return variants
+
+
+def thumbnail_specs():
+    """Все пары (геометрия, опции), которые нужно создать заранее."""
+    specs = list(settings.POST_THUMBNAILS.values())
+    for _, _, geometry, options in card_variants():
+        if (geometry, options) not in specs:
+            specs.append((geometry, options))
+    return specs
+
+
+def make_thumbnails(name):
+    """Создаёт недостающие миниатюры картинки.
+
+    Затем сбрасывает кэш лент и страниц: в них могли попасть карточки,
+    показанные без миниатюр.
+    """
+    for geometry, options in thumbnail_specs():
+        thumbnail = get_thumbnail(name, geometry, **options)
+        if not thumbnail.exists():
+            # В хранилище ключей запись есть, а файл потерян.
+            default.kvstore.delete(thumbnail)
+            get_thumbnail(name, geometry, **options)
+    cache.delete(f'thumbnails:pending:{name}')
+    bump_generation('feed', 'page')
+
+
+def schedule(post):
+    """Ставит миниатюры картинки поста в очередь после коммита."""
+    if post.image:
+        _schedule(post.image.name)
+
+
+def reschedule(name):
+    """Снова ставит в очередь миниатюры, которых не нашлось при показе.
+
+    Пока задача не выполнилась, повторные показы её не дублируют.
+    """
+    if cache.add(f'thumbnails:pending:{name}', True, PENDING_TIMEOUT):
+        _schedule(name)
+
+
+def _schedule(name):
+    background.after_commit(
+        'thumbnails', settings.THUMBNAIL_WORKERS, make_thumbnails, name
+    )
+
+
+class CardImage:
+    """Картинка карточки: основная миниатюра и варианты для srcset.
+
+    complete ложно, пока готовы не все варианты: такую карточку не
+    кэшируют, чтобы srcset не остался неполным до истечения кэша.
+    """
+
+    def __init__(self, thumbnail, variants, complete=True):
+        self.url = thumbnail.url
+        self.complete = complete
+        self.width, self.height = thumbnail.size
+        self.srcset = self._srcset(variants.get(None, []))
+        self.sources = [
+            (Image.MIME[image_format], self._srcset(thumbnails))
+            for image_format, thumbnails in variants.items()
+            if image_format is not None
+        ]
+
+    @staticmethod
+    def _srcset(thumbnails):
+        return ', '.join(
+            f'{thumbnail.url} {thumbnail.width}w' for thumbnail in thumbnails
+        )
+
+
+def card_thumbnails(posts):
+    """Картинки карточек для страницы постов: {id поста: CardImage}.
+
+    Миниатюры при показе не создаются. Если в хранилище ключей нет
+    основной миниатюры, поста в ответе нет, недостающие варианты не
+    попадают в srcset, а создание пропавших снова ставится в очередь.
+    """
+    geometry, options = settings.POST_THUMBNAILS['card']
+    variants = card_variants()
+    images = {post.pk: post.image for post in posts if post.image}
+    keys = {}
+    for pk, image in images.items():
+        keys[pk] = add_prefix(thumbnail_file(image, geometry, options).key)
+        for image_format, _, variant_geometry, variant_options in variants:
+            thumbnail = thumbnail_file(
+                image, variant_geometry, variant_options
+            )
+            keys[pk, image_format, variant_geometry] = add_prefix(
+                thumbnail.key
+            )
+    values = _get_raw_many(list(set(keys.values())))
+    thumbnails = {}
+    for pk, image in images.items():
+        found = {}
+        complete = True
+        for image_format, _, variant_geometry, _ in variants:
+            value = values.get(keys[pk, image_format, variant_geometry])
+            if value:
+                found.setdefault(image_format, []).append(
+                    deserialize_image_file(value)
+                )
+            else:
+                complete = False
+        thumbnail = None
+        if values.get(keys[pk]):
+            thumbnail = deserialize_image_file(values[keys[pk]])
+        if thumbnail is None or not complete:
+            reschedule(image.name)
+        # Без размеров (исходный файл не прочитался) шаблон покажет
+        # исходную картинку.
+        if thumbnail is not None and thumbnail.size:
+            thumbnails[pk] = CardImage(thumbnail, found, complete)
+    return thumbnails
+
+
+def thumbnail_file(image, geometry, options):
+    """Миниатюра с тем же именем, что выберет sorl, без чтения файлов."""
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def _get_raw_many(keys):
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedKVStore):
+        return {key: kvstore._get_raw(key) for key in keys}
+    values = kvstore.cache.get_many(keys)
+    missed = [key for key in keys if key not in values]
+    if missed:
+        found = dict(
+            KVStore.objects.filter(key__in=missed).values_list('key', 'value')
+        )
+        missed = {key: found.get(key, EMPTY_VALUE) for key in missed}
+        kvstore.cache.set_many(
+            missed, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(missed)
+    return {
+        key: value for key, value in values.items() if value != EMPTY_VALUE
+    }
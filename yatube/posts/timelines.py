@@ -0,0 +1,224 @@
+"""Ленты подписок с гибридной раскладкой.
+
+Посты обычных авторов раскладываются в материализованные ленты
+подписчиков (fan-out-on-write): при публикации пост копируется во все
+ленты, при подписке в ленту добавляются последние посты автора, при
+отписке они удаляются. Удалённые посты уходят из лент каскадом.
+
+Автор, набравший FANOUT_FOLLOWERS_LIMIT подписчиков, становится
+«звездой» (Profile.celebrity): его посты в ленты не копируются, а
+подмешиваются при чтении прямо из индекса (author, pub_date, id)
+таблицы постов (fan-out-on-read). Одна публикация такого автора не
+превращается в сотни тысяч вставок, а читателю это стоит одного
+запроса.
+
+Обратно автор возвращается, только когда подписчиков становится меньше
+порога на FANOUT_HYSTERESIS. Его последние посты раскладываются по
+лентам всех подписчиков после коммита в фоновом потоке пачками, и лишь
+затем снимается флаг — до этого посты по-прежнему подмешиваются.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core import background
+from .models import Follow, Post, Profile, TimelineEntry
+
+# Сколько держится метка запущенного возврата автора в ленты, если
+# поток упал, не сняв её.
+DEMOTION_LOCK_TIMEOUT = 60 * 60
+# Сколько строк лент примерно вставляет один запрос backfill_all.
+BACKFILL_ALL_ROWS = 200000
+
+
+def is_celebrity(author_id):
+    return Profile.objects.filter(user_id=author_id, celebrity=True).exists()
+
+
+def demotion_limit():
+    """Ниже этого числа подписчиков «звезда» возвращается в ленты."""
+    return settings.FANOUT_FOLLOWERS_LIMIT - settings.FANOUT_HYSTERESIS
+
+
+def promote(author_id):
+    """Делает автора «звездой»: дальше его посты подмешиваются."""
+    Profile.objects.filter(user_id=author_id).update(celebrity=True)
+
+
+def make_entry(user_id, post):
+    return TimelineEntry(
+        user_id=user_id,
+        post_id=post.pk,
+        author_id=post.author_id,
+        pub_date=post.pub_date,
+    )
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (make_entry(user_id, post) for user_id in followers.iterator()),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(follow):
+    """Заполняет ленту подписчика последними постами автора."""
+    if is_celebrity(follow.author_id):
+        return
+    posts = Post.objects.filter(author_id=follow.author_id).only(
+        'pk', 'author_id', 'pub_date'
+    )[:settings.TIMELINE_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        (make_entry(follow.user_id, post) for post in posts),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_followers(author_id):
+    """Раскладывает последние посты автора по лентам всех подписчиков.
+
+    Подписчики читаются пачками по id, каждая пачка вставляется своей
+    транзакцией, так что подписки, созданные по ходу, тоже попадут.
+    """
+    posts = list(Post.objects.filter(author_id=author_id).only(
+        'pk', 'author_id', 'pub_date'
+    )[:settings.TIMELINE_BACKFILL])
+    if not posts:
+        return
+    follows = Follow.objects.filter(author_id=author_id).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(follows.filter(pk__gt=last_pk).values_list(
+            'pk', 'user_id'
+        )[:settings.TIMELINE_BATCH_SIZE])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+        with transaction.atomic():
+            TimelineEntry.objects.bulk_create(
+                (
+                    make_entry(user_id, post)
+                    for _, user_id in batch for post in posts
+                ),
+                batch_size=settings.TIMELINE_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+
+
+def demote(author_id):
+    """Возвращает «звезду» в ленты подписчиков.
+
+    Флаг снимается после раскладки, если подписчиков всё ещё меньше
+    порога; посты, опубликованные за это время, раскладываются следом.
+    """
+    started = timezone.now()
+    try:
+        backfill_followers(author_id)
+        demoted = Profile.objects.filter(
+            user_id=author_id,
+            followers_count__lt=settings.FANOUT_FOLLOWERS_LIMIT,
+        ).update(celebrity=False)
+        if demoted:
+            for post in Post.objects.filter(
+                author_id=author_id, pub_date__gte=started
+            ):
+                fan_out(post)
+    finally:
+        cache.delete(f'timelines:demotion:{author_id}')
+
+
+def schedule_demotion(author_id):
+    """Ставит возврат автора в ленты в очередь после коммита."""
+    if not cache.add(
+        f'timelines:demotion:{author_id}', True, DEMOTION_LOCK_TIMEOUT
+    ):
+        return
+    background.after_commit(
+        'timelines', settings.TIMELINE_WORKERS, demote, author_id
+    )
+
+
+def backfill_all():
+    """Раскладывает посты по лентам всех подписчиков обычных авторов.
+
+    Нужна после массового импорта в обход сигналов, когда счётчики
+    подписчиков и постов уже пересчитаны. Строки лент собираются в базе
+    одним INSERT … SELECT на пачку авторов: подписки соединяются с
+    последними TIMELINE_BACKFILL постами каждого автора. Пачка
+    набирается по счётчикам примерно на BACKFILL_ALL_ROWS строк.
+    """
+    authors = Profile.objects.filter(
+        followers_count__gt=0, posts_count__gt=0, celebrity=False
+    ).order_by('user_id').values_list(
+        'user_id', 'followers_count', 'posts_count'
+    )
+    batch, rows = [], 0
+    for author_id, followers_count, posts_count in authors.iterator():
+        batch.append(author_id)
+        rows += followers_count * min(
+            posts_count, settings.TIMELINE_BACKFILL
+        )
+        if (rows >= BACKFILL_ALL_ROWS
+                or len(batch) == settings.TIMELINE_BATCH_SIZE):
+            _backfill_authors(batch)
+            batch, rows = [], 0
+    if batch:
+        _backfill_authors(batch)
+
+
+def _backfill_authors(author_ids):
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    with connection.cursor() as cursor:
+        # Строки идут в порядке индекса лент (user, pub_date, post):
+        # вставка по порядку в разы быстрее вставки вразброс. WHERE
+        # перед ON CONFLICT обязателен для SQLite: без него парсер
+        # принимает ON за условие соединения.
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            f'(user_id, post_id, author_id, pub_date) '
+            f'SELECT follow.user_id, post.id, post.author_id, '
+            f'post.pub_date '
+            f'FROM (SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+            f'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+            f') AS position FROM {Post._meta.db_table} '
+            f'WHERE author_id IN ({placeholders})) AS post '
+            f'JOIN {Follow._meta.db_table} AS follow '
+            f'ON follow.author_id = post.author_id '
+            f'WHERE post.position <= %s '
+            f'ORDER BY follow.user_id, post.pub_date, post.id '
+            f'ON CONFLICT DO NOTHING',
+            [*author_ids, settings.TIMELINE_BACKFILL],
+        )
+
+
+def prune(follow):
+    """Убирает посты автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id,
+        author_id=follow.author_id,
+    ).delete()
+
+
+def follow_feed(user):
+    """Источники ленты подписок пользователя.
+
+    Возвращает записи материализованной ленты и queryset постов
+    «звёзд», на которых он подписан (None, если таких нет).
+    """
+    entries = user.timeline.select_related('post__group', 'post__author')
+    celebrities = list(Follow.objects.filter(
+        user=user, author__profile__celebrity=True
+    ).values_list('author_id', flat=True))
+    if not celebrities:
+        return entries, None
+    posts = Post.objects.filter(author_id__in=celebrities).for_cards()
+    return entries.exclude(author_id__in=celebrities), posts
@@ -1,10 +1,242 @@
-from django.core.paginator import Paginator
+import hashlib
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from core.cache import get_generation
+
+
+def count_cache_key(name):
+    return f'posts_count:{name}'
+
+
+def encode_cursor(date, pk):
+    """Упаковывает позицию в ленте в непрозрачный токен."""
+    return urlsafe_base64_encode(force_bytes(f'{date.isoformat()}|{pk}'))
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора, для битого токена вернёт None."""
+    try:
+        date, pk = urlsafe_base64_decode(token).decode().split('|')
+        date, pk = parse_datetime(date), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if date is None:
+        return None
+    return date, pk
+
+
+def seek_filter(ordering, cursor, reverse=False):
+    """Условие «после курсора» для пары полей (дата, id) из ordering.
+
+    С reverse=True — «до курсора», для листания назад.
+    """
+    date, pk = cursor
+    date_field, id_field = (field.lstrip('-') for field in ordering)
+    descending = ordering[0].startswith('-')
+    lookup = 'lt' if descending != reverse else 'gt'
+    # Лишнее с виду нестрогое условие по дате позволяет базе начать
+    # чтение индекса сразу с курсора, а не с начала ленты: условие
+    # с OR целиком в поиск по индексу не превращается.
+    return Q(**{f'{date_field}__{lookup}e': date}) & (
+        Q(**{f'{date_field}__{lookup}': date})
+        | Q(**{date_field: date, f'{id_field}__{lookup}': pk})
+    )
+
+
+class FeedPaginator(Paginator):
+    """Paginator ленты постов.
+
+    Кроме обычных номеров страниц умеет листать ленту по курсору —
+    паре (дата, id) последнего показанного поста. Такая страница
+    выбирается одним запросом по индексу без COUNT и OFFSET, поэтому
+    время ответа не зависит от глубины листания.
+
+    Для номерных страниц число постов передаётся готовым в count
+    (денормализованные счётчики групп и авторов) или кэшируется под
+    ключом count_key; сигналы posts.signals сбрасывают его при
+    создании и удалении постов.
+
+    Порядок задаёт ordering: пара полей (дата, id) по убыванию или по
+    возрастанию, как у комментариев в CommentPaginator.
+
+    Страница курсора — обычный Page: number и num_pages подобраны так,
+    чтобы has_next и has_previous отвечали правильно, а токены соседних
+    страниц лежат в next_cursor и previous_cursor.
+    """
+
+    ordering = ('-pub_date', '-id')
+    cursor_mode = False
+    next_cursor = None
+    previous_cursor = None
+
+    def __init__(self, object_list, per_page, count=None, count_key=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = count
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        """Число постов из счётчика или кэша без COUNT на каждый запрос."""
+        if self.known_count is not None:
+            return self.known_count
+        if self.count_key is None:
+            return self.total_count()
+        key = count_cache_key(self.count_key)
+        count = cache.get(key)
+        if count is None:
+            count = self.total_count()
+            cache.set(key, count, settings.POSTS_COUNT_TIMEOUT)
+        return count
+
+    def total_count(self):
+        return Paginator.count.func(self)
+
+    def cursor_page(self, token=None, reverse=False):
+        cursor = decode_cursor(token) if token else None
+        if cursor is None and reverse:
+            return self.cursor_page()
+        items = self._fetch_page(cursor, reverse)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if reverse:
+            if not has_more:
+                # Вернулись к началу ленты — показываем полную первую
+                # страницу, а не её хвост.
+                return self.cursor_page()
+            items.reverse()
+            has_next, has_previous = True, True
+        else:
+            has_next, has_previous = has_more, cursor is not None
+        self.cursor_mode = True
+        if items and has_next:
+            self.next_cursor = self._cursor_for(items[-1])
+        if items and has_previous:
+            self.previous_cursor = self._cursor_for(items[0])
+        number = 2 if has_previous else 1
+        self.num_pages = number + 1 if has_next else number
+        return self._get_page(items, number, self)
+
+    def _fetch_page(self, cursor, reverse):
+        return self._fetch(self.object_list, self.ordering, cursor, reverse)
+
+    def _fetch(self, queryset, ordering, cursor, reverse):
+        """Следующие per_page + 1 объектов после курсора."""
+        if cursor is not None:
+            queryset = queryset.filter(
+                seek_filter(ordering, cursor, reverse)
+            )
+        if reverse:
+            ordering = [self._flip(field) for field in ordering]
+        return list(queryset.order_by(*ordering)[:self.per_page + 1])
+
+    def _cursor_for(self, item):
+        date_field, id_field = (field.lstrip('-') for field in self.ordering)
+        return encode_cursor(
+            getattr(item, date_field), getattr(item, id_field)
+        )
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+
+class TimelinePaginator(FeedPaginator):
+    """Paginator ленты подписок.
+
+    Листает материализованную ленту TimelineEntry и отдаёт на страницу
+    сами посты. Посты авторов с огромным числом подписчиков в ленты не
+    раскладываются: их queryset передаётся в posts и подмешивается
+    при чтении.
+    """
+
+    entry_ordering = ('-pub_date', '-post_id')
+
+    def __init__(self, object_list, per_page, posts=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.posts = posts
+
+    def total_count(self):
+        count = self.object_list.count()
+        if self.posts is not None:
+            count += self.posts.count()
+        return count
+
+    def page(self, number):
+        number = self.validate_number(number)
+        top = number * self.per_page
+        posts = [] if self.posts is None else self.posts[:top]
+        items = self._merge(self.object_list[:top], posts)
+        return self._get_page(items[top - self.per_page:top], number, self)
+
+    def _fetch_page(self, cursor, reverse):
+        entries = self._fetch(
+            self.object_list, self.entry_ordering, cursor, reverse
+        )
+        posts = []
+        if self.posts is not None:
+            posts = self._fetch(self.posts, self.ordering, cursor, reverse)
+        return self._merge(entries, posts, reverse)[:self.per_page + 1]
+
+    @staticmethod
+    def _merge(entries, posts, reverse=False):
+        items = [entry.post for entry in entries] + list(posts)
+        if posts:
+            items.sort(
+                key=lambda post: (post.pub_date, post.pk),
+                reverse=not reverse,
+            )
+        return items
+
+
+class CommentPaginator(FeedPaginator):
+    """Комментарии поста от старых к новым, страницы по курсору."""
+
+    ordering = ('created', 'id')
+
+
+def count_generation(model):
+    """Поколение счётчиков строк модели, см. CachedCountPaginator."""
+    return f'count:{model._meta.label_lower}'
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator списков админки с кэшированным числом строк.
+
+    COUNT по миллионам строк на каждое открытие страницы дороже самого
+    списка. Число кэшируется по тексту SQL-запроса (с фильтрами и
+    поиском) и поколению модели, которое сигналы posts.signals
+    сбрасывают при создании и удалении строк.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(f'{sql}|{params!r}'.encode()).hexdigest()
+        generation = get_generation(count_generation(queryset.model))
+        key = f'admin_count:{generation}:{digest}'
+        count = cache.get(key)
+        if count is None:
+            count = Paginator.count.func(self)
+            cache.set(key, count, settings.ADMIN_COUNT_TIMEOUT)
+        return count
 
 
-def the_paginator(queryset, request):
-    paginator = Paginator(queryset, settings.NUMBER_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+def the_paginator(queryset, request, paginator_class=FeedPaginator,
+                  **kwargs):
+    paginator = paginator_class(queryset, settings.NUMBER_POSTS, **kwargs)
+    if 'page' in request.GET:
+        # Старые ссылки вида ?page=N продолжают работать.
+        return paginator.get_page(request.GET.get('page'))
+    if request.GET.get('after'):
+        return paginator.cursor_page(request.GET['after'], reverse=True)
+    return paginator.cursor_page(request.GET.get('before'))
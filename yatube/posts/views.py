@@ -1,35 +1,108 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from PIL import Image
+
+from core.cache import anonymous_cache_page, generation_etag, get_generation
 
+from . import export, resize, thumbnails, timelines
+from .search import SearchResults
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import the_paginator
+from .models import Comment, Follow, Group, Post, User
+from .utils import CommentPaginator, TimelinePaginator, the_paginator
+
+
+def post_validators(request, post_id):
+    """Время изменения поста с комментариями, счётчики, автор и группа.
+
+    Считается одним запросом до рендеринга страницы, чтобы ответить
+    304 Not Modified, не трогая шаблоны.
+    """
+    if not hasattr(request, 'post_validators'):
+        posts = Post.objects.filter(pk=post_id).order_by()
+        request.post_validators = posts.annotate(
+            last_comment=Max('comments__created'),
+        ).values_list(
+            'updated',
+            'last_comment',
+            'comments_count',
+            'author__profile__posts_count',
+            # Имя автора и группа показаны на странице, но их смена не
+            # меняет дат: она меняет только ETag.
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'group__title',
+            'group__slug',
+        ).first()
+    return request.post_validators
+
+
+def post_detail_last_modified(request, post_id):
+    validators = post_validators(request, post_id)
+    if validators is None:
+        return None
+    updated, last_comment, *_ = validators
+    return max(updated, last_comment or updated)
+
+
+def post_detail_etag(request, post_id):
+    validators = post_validators(request, post_id)
+    if validators is None:
+        return None
+    validator = ':'.join(str(part) for part in (
+        *validators,
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ))
+    return hashlib.md5(validator.encode()).hexdigest()
 
 
+@condition(etag_func=generation_etag('page'))
+@anonymous_cache_page
 def index(request):
     template = 'posts/index.html'
-    posts = Post.objects.select_related('group', 'author')
+    posts = Post.objects.for_cards()
     context = {
-        'page_obj': the_paginator(posts, request),
+        'page_obj': the_paginator(posts, request, count_key='index'),
     }
     return render(request, template, context)
 
 
+@condition(etag_func=generation_etag('page'))
+@anonymous_cache_page
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('group', 'author')
+    posts = group.posts.for_cards()
     context = {
         'group': group,
-        'page_obj': the_paginator(posts, request)
+        'page_obj': the_paginator(posts, request, count=group.posts_count),
     }
     return render(request, template, context)
 
 
+@condition(etag_func=generation_etag('page'))
+@anonymous_cache_page
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('group', 'author')
+    author = get_object_or_404(
+        User.objects.select_related('profile'),
+        username=username
+    )
+    posts = author.posts.for_cards()
+    posts_count = getattr(
+        getattr(author, 'profile', None), 'posts_count', 0
+    )
     following = (
         request.user.is_authenticated
         and request.user != author
@@ -39,26 +112,71 @@ def profile(request, username):
     )
     context = {
         'author': author,
-        'page_obj': the_paginator(posts, request),
+        'page_obj': the_paginator(posts, request, count=posts_count),
         'following': following,
     }
     return render(request, template, context)
 
 
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    results = SearchResults(
+        query, Post.objects.for_cards()
+    )
+    paginator = Paginator(results, settings.NUMBER_POSTS)
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('page')),
+        'page_query': f'{urlencode({"q": query})}&',
+    }
+    return render(request, template, context)
+
+
+@condition(
+    etag_func=post_detail_etag,
+    last_modified_func=post_detail_last_modified,
+)
+@anonymous_cache_page
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post.objects.select_related('group', 'author'),
-                             pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('group', 'author', 'author__profile'),
+        pk=post_id
+    )
     form = CommentForm()
-    comments = post.comments.select_related('author')
     context = {
         'post': post,
         'form': form,
-        'comments': comments,
+        'comments': comments_page(request, post.pk),
+        'thumb': thumbnails.card_thumbnails([post]).get(post.pk),
     }
     return render(request, template, context)
 
 
+def comments_page(request, post_id):
+    paginator = CommentPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+    )
+    return paginator.cursor_page(request.GET.get('comments'))
+
+
+@condition(
+    etag_func=post_detail_etag,
+    last_modified_func=post_detail_last_modified,
+)
+def post_comments(request, post_id):
+    """Следующая порция комментариев поста фрагментом HTML."""
+    if post_validators(request, post_id) is None:
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(request, post_id),
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -71,6 +189,7 @@ def post_create(request):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
+    thumbnails.schedule(post)
     return redirect('posts:profile', post.author)
 
 
@@ -86,6 +205,8 @@ def post_edit(request, post_id):
         return redirect('posts:post_detail', post.pk)
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect('posts:post_detail', post.pk)
     context = {
         'post': post,
@@ -109,9 +230,16 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
+    entries, posts = timelines.follow_feed(request.user)
     context = {
-        'page_obj': the_paginator(posts, request),
+        'page_obj': the_paginator(
+            entries,
+            request,
+            paginator_class=TimelinePaginator,
+            posts=posts,
+            count_key=f'follow:{request.user.pk}',
+        ),
+        'follow_generation': get_generation(f'follow:{request.user.pk}'),
     }
     return render(request, template, context)
 
@@ -132,3 +260,36 @@ def profile_unfollow(request, username):
         author=unfollow_user
     ).delete()
     return redirect('posts:profile', username=username)
+
+
+@cache_control(public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+def resized_image(request, token):
+    params = resize.read_token(token)
+    if params is None:
+        raise Http404
+    path = resize.get_variant(*params)
+    if path is None:
+        raise Http404
+    *_, image_format = params
+    return FileResponse(
+        open(path, 'rb'), content_type=Image.MIME[image_format]
+    )
+
+
+@login_required
+def profile_export(request, username):
+    """Архив постов и комментариев автора для него самого и модераторов."""
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        raise PermissionDenied
+    export_format = request.GET.get('format', 'json')
+    if export_format not in export.FORMATS:
+        raise Http404
+    content_type, extension = export.FORMATS[export_format]
+    response = StreamingHttpResponse(
+        export.export(author, export_format), content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{author.username}.{extension}"'
+    )
+    return response
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,6 +80,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.feed_cache.feed_cache',
             ],
         },
     },
@@ -86,6 +88,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# manage.py test накладывает настройки из yatube.settings_test.
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -143,11 +148,108 @@ LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 NUMBER_POSTS = 10
-
+# Сколько номеров страниц показывать по обе стороны от текущей.
+PAGINATOR_WINDOW = 3
+# Число постов в лентах кэшируется и сбрасывается сигналами.
+POSTS_COUNT_TIMEOUT = 60 * 60 * 24
+# Числа строк в списках админки, см. posts.utils.CachedCountPaginator.
+ADMIN_COUNT_TIMEOUT = 60 * 60
+# Комментарии на странице поста и в каждой подгружаемой порции.
+COMMENTS_PER_PAGE = 20
+# Сколько последних постов автора попадает в ленту при подписке.
+TIMELINE_BACKFILL = 1000
+TIMELINE_BATCH_SIZE = 500
+# С этого числа подписчиков посты автора не раскладываются по лентам,
+# а подмешиваются при чтении. Порог подбирается командой bench_fanout.
+FANOUT_FOLLOWERS_LIMIT = 1000
+# Обратно в ленты посты «звезды» раскладываются, только когда
+# подписчиков становится меньше FANOUT_FOLLOWERS_LIMIT на столько:
+# колебания у порога не запускают раскладку снова и снова.
+FANOUT_HYSTERESIS = 100
+# Потоки, раскладывающие посты бывших «звёзд» после коммита; 0 — сразу
+# в потоке запроса (так в тестах, см. yatube.settings_test).
+TIMELINE_WORKERS = 1
+
+# Фрагменты лент живут долго: их сбрасывает смена поколения кэша
+# при изменении постов, комментариев и групп.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+# Карточки постов версионируются временем изменения поста.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# RSS и Atom: сколько постов отдавать и сколько хранить готовый ответ,
+# который сбрасывается сменой поколения 'syndication', см. posts.feeds.
+SYNDICATION_ITEMS = 20
+SYNDICATION_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Наибольший размер страницы JSON API, см. posts.api.
+API_MAX_LIMIT = 100
+
+# Кэш целых страниц для анонимных посетителей, см.
+# core.cache.anonymous_cache_page.
+PAGE_CACHE_ENABLED = False
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Миниатюры, которые создаются сразу после загрузки картинки, см.
+# posts.thumbnails. Должны совпадать с includes/thumnail.html.
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Ширины картинки карточки для srcset и форматы, в которых они
+# создаются вдобавок к формату миниатюр по умолчанию (если Pillow умеет
+# их сохранять).
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('WEBP',)
+# Сколько результатов поиска можно пролистать, см. posts.search.
+SEARCH_MAX_RESULTS = 1000
+
+# Загрузки всегда пишутся во временные файлы, больше UPLOAD_MAX_SIZE
+# байт не принимаются, см. core.uploadhandlers.
+FILE_UPLOAD_HANDLERS = [
+    'core.uploadhandlers.LimitedTemporaryFileUploadHandler',
+]
+UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+
+# Дисковый кэш копий картинок по подписанным ссылкам, см. posts.resize.
+RESIZE_ROOT = os.path.join(MEDIA_ROOT, 'resized')
+RESIZE_MAX_SIDE = 2000
+# Потоков для фонового создания миниатюр; 0 — создавать сразу.
+THUMBNAIL_WORKERS = 2
+
+# Общий для всех воркеров кэш в файле SQLite, см. core.backends.sqlite.
+# Сравнение с LocMemCache: python manage.py bench_cache.
+# Тесты очищают кэш, поэтому у них свой файл, см. yatube.settings_test.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.backends.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Сколько SQL-запросов может сделать view, см. core.query_budget.
+# Бюджеты страниц с карточками считаются по холодному кэшу: один запрос
+# уходит на данные миниатюр картинок, в ленте подписок ещё один — на
+# список «звёзд», чьи посты подмешиваются при чтении.
+QUERY_BUDGETS = {
+    'posts:index': 4,
+    'posts:group_posts': 5,
+    'posts:profile': 5,
+    'posts:post_detail': 6,
+    'posts:post_comments': 4,
+    'posts:follow_index': 6,
+    'posts:search': 3,
+    'posts:api_index': 3,
+    'posts:api_group_posts': 4,
+    'posts:api_profile': 4,
+    'posts:api_follow_index': 6,
+    'posts:api_post_detail': 4,
+}
+# True — превышение бюджета бросает исключение, False — только пишет
+# предупреждение в лог.
+QUERY_BUDGET_STRICT = False
@@ -0,0 +1,32 @@
+"""Настройки для тестов.
+
+У тестов свои кэш и каталог загрузок во временном каталоге, а не
+файлы работающего сайта: тесты очищают кэш и загружают картинки.
+Фоновые задачи выполняются сразу после коммита, чтобы не пережить
+тест. pytest берёт этот модуль из pytest.ini, а manage.py test
+накладывает OVERRIDES через core.test_runner.TestRunner.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES
+
+TEST_ROOT = tempfile.mkdtemp(prefix='yatube-test-')
+atexit.register(shutil.rmtree, TEST_ROOT, ignore_errors=True)
+
+OVERRIDES = {
+    'CACHES': {
+        'default': {
+            **CACHES['default'],
+            'LOCATION': os.path.join(TEST_ROOT, 'cache.sqlite3'),
+        },
+    },
+    'MEDIA_ROOT': os.path.join(TEST_ROOT, 'media'),
+    'RESIZE_ROOT': os.path.join(TEST_ROOT, 'media', 'resized'),
+    'THUMBNAIL_WORKERS': 0,
+    'TIMELINE_WORKERS': 0,
+}
+globals().update(OVERRIDES)